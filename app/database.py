@@ -1,4 +1,4 @@
-from sqlalchemy import create_engine, Column, String, DateTime, Integer, Text, JSON
+from sqlalchemy import create_engine, Column, String, DateTime, Integer, Text, JSON, Index, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 import os
@@ -15,19 +15,101 @@ class SessionDB(Base):
     
     id = Column(String, primary_key=True)
     container_id = Column(String, nullable=False)
+    docker_host = Column(String, nullable=True)
     vnc_port = Column(Integer, nullable=False)
     status = Column(String, default="active")
+    parent_session_id = Column(String, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
 
 class ChatMessageDB(Base):
     __tablename__ = "chat_messages"
+    # On PostgreSQL the table is range partitioned by month on timestamp, which
+    # requires the partition key to be part of the primary key
+    __table_args__ = (
+        Index("ix_chat_messages_session_timestamp", "session_id", "timestamp"),
+        {"postgresql_partition_by": "RANGE (timestamp)"},
+    )
     
     id = Column(String, primary_key=True)
     session_id = Column(String, nullable=False)
     role = Column(String, nullable=False)
     content = Column(Text, nullable=False)
-    timestamp = Column(DateTime, default=datetime.utcnow)
-    metadata = Column(JSON)
+    timestamp = Column(DateTime, primary_key=True, default=datetime.utcnow)
+    # "metadata" is reserved on declarative models, so map the column under another name
+    message_metadata = Column("metadata", JSON)
+
+class SessionSnapshotDB(Base):
+    __tablename__ = "session_snapshots"
+
+    id = Column(String, primary_key=True)
+    session_id = Column(String, nullable=False, index=True)
+    image = Column(String, nullable=False)
+    docker_host = Column(String, nullable=True)
+    container_id = Column(String, nullable=False)
+    checkpoint_id = Column(String, nullable=True)
+    vnc_port = Column(Integer, nullable=False)
+    mode = Column(String, nullable=False)  # "filesystem" or "checkpoint"
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class ChatArchiveSegmentDB(Base):
+    __tablename__ = "chat_archive_segments"
+
+    id = Column(String, primary_key=True)
+    session_id = Column(String, nullable=False, index=True)
+    path = Column(String, nullable=False)
+    message_count = Column(Integer, nullable=False)
+    first_timestamp = Column(DateTime, nullable=False)
+    last_timestamp = Column(DateTime, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+def _next_month(month: datetime) -> datetime:
+    return month.replace(year=month.year + month.month // 12, month=month.month % 12 + 1)
+
+def ensure_chat_partitions(bind=None, months_ahead: int = 1):
+    """Create the monthly chat_messages partitions on PostgreSQL, no-op elsewhere
+
+    Rows outside every monthly range land in a default partition, so inserts
+    never fail if the roll-forward has not run yet. Raises on the first
+    statement that fails; partitions created before it are kept.
+    """
+    bind = bind or engine
+    if bind.dialect.name != "postgresql":
+        return
+
+    statements = ["CREATE TABLE IF NOT EXISTS chat_messages_default PARTITION OF chat_messages DEFAULT"]
+    month = datetime.utcnow().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    for _ in range(months_ahead + 1):
+        next_month = _next_month(month)
+        statements.append(
+            f"CREATE TABLE IF NOT EXISTS chat_messages_{month:%Y_%m} PARTITION OF chat_messages "
+            f"FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{next_month:%Y-%m-%d}')"
+        )
+        month = next_month
+
+    for statement in statements:
+        with bind.begin() as conn:
+            conn.execute(text(statement))
+
+def get_session_lineage(db, session_id: str):
+    """Session ids from the original session down to ``session_id`` across resumes"""
+    lineage = []
+    while session_id and session_id not in lineage:
+        lineage.insert(0, session_id)
+        session = db.query(SessionDB).filter(SessionDB.id == session_id).first()
+        session_id = session.parent_session_id if session else None
+    return lineage
+
+def get_session_tree(db, session_id: str):
+    """Every session resumed from the same original session as ``session_id``, itself included"""
+    root_id = get_session_lineage(db, session_id)[0]
+    tree = db.query(SessionDB).filter(SessionDB.id == root_id).all()
+    parent_ids = [session.id for session in tree]
+    while parent_ids:
+        children = db.query(SessionDB).filter(SessionDB.parent_session_id.in_(parent_ids)).all()
+        children = [child for child in children if child not in tree]
+        tree.extend(children)
+        parent_ids = [child.id for child in children]
+    return tree
 
 def get_db():
     db = SessionLocal()
@@ -35,6 +117,3 @@ def get_db():
         yield db
     finally:
         db.close()
-
-# Create tables
-Base.metadata.create_all(bind=engine)
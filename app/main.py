@@ -1,18 +1,46 @@
-from fastapi import FastAPI, WebSocket, HTTPException, Depends
+from fastapi import FastAPI, WebSocket, HTTPException, Depends, Query
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 import asyncio
+import os
+import time
 import uuid
+from contextlib import asynccontextmanager
 from datetime import datetime
 from typing import List, Optional
 import json
 
-from .database import get_db, SessionDB, ChatMessageDB
-from .models import Session, ChatMessage, SessionCreate, SessionResponse
-from .services import AgentService, ContainerService, VNCService
-from .websocket_manager import WebSocketManager
+from .database import get_db, get_session_lineage, get_session_tree, SessionDB, ChatMessageDB, SessionSnapshotDB
+from .models import (
+    Session, ChatMessage, SessionCreate, SessionResponse,
+    SessionSnapshotCreate, SessionSnapshotResponse, SearchResponse
+)
+from .services import AgentService, ArchiveService, ContainerService, SearchService, VNCService
+from .websocket_manager import SESSION_ENDED_CLOSE_CODE, WebSocketManager
+
+# Services are cheap to construct: Docker, the database and the Anthropic SDK
+# are only touched on first use, so importing this module does no I/O
+container_service = ContainerService()
+vnc_service = VNCService()
+archive_service = ArchiveService()
+search_service = SearchService()
+websocket_manager = WebSocketManager()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start background jobs with the worker and stop them on shutdown"""
+    if os.getenv("RUN_MIGRATIONS_ON_STARTUP", "false").lower() == "true":
+        from .migrations import run_migrations
+        await asyncio.to_thread(run_migrations)
+
+    # Archive inactive sessions' messages in the background
+    compaction_task = asyncio.create_task(archive_service.run_compaction_loop())
+    try:
+        yield
+    finally:
+        compaction_task.cancel()
 
-app = FastAPI(title="CambioML Computer Use Backend", version="1.0.0")
+app = FastAPI(title="CambioML Computer Use Backend", version="1.0.0", lifespan=lifespan)
 
 # CORS middleware
 app.add_middleware(
@@ -26,11 +54,6 @@ app.add_middleware(
 # Static files for frontend
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
-# Services
-container_service = ContainerService()
-vnc_service = VNCService()
-websocket_manager = WebSocketManager()
-
 @app.post("/sessions", response_model=SessionResponse)
 async def create_session(
     session_data: SessionCreate,
@@ -39,12 +62,14 @@ async def create_session(
     """Create a new agent session with isolated container"""
     try:
         # Create container for this session
+        started = time.perf_counter()
         container_info = await container_service.create_container()
         
         # Create session in database
         session = SessionDB(
             id=str(uuid.uuid4()),
             container_id=container_info["container_id"],
+            docker_host=container_info["host"],
             vnc_port=container_info["vnc_port"],
             status="active",
             created_at=datetime.utcnow()
@@ -59,7 +84,8 @@ async def create_session(
             status=session.status,
             vnc_url=f"/vnc/{session.id}",
             websocket_url=f"/ws/{session.id}",
-            created_at=session.created_at
+            created_at=session.created_at,
+            startup_seconds=time.perf_counter() - started
         )
         
     except Exception as e:
@@ -77,7 +103,8 @@ async def get_session(session_id: str, db = Depends(get_db)):
         status=session.status,
         vnc_url=f"/vnc/{session.id}",
         websocket_url=f"/ws/{session.id}",
-        created_at=session.created_at
+        created_at=session.created_at,
+        parent_session_id=session.parent_session_id
     )
 
 @app.delete("/sessions/{session_id}")
@@ -87,46 +114,207 @@ async def end_session(session_id: str, db = Depends(get_db)):
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
     
-    # Cleanup container
-    await container_service.stop_container(session.container_id)
+    # Cleanup container. Only an active session owns its container: after a
+    # checkpoint resume the new session runs in the same container.
+    if session.status == "active":
+        await container_service.stop_container(session.container_id, session.docker_host)
+    elif session.status == "snapshotted":
+        # An unused checkpoint keeps its exited container around; drop it and
+        # let later resumes start from the filesystem image instead
+        pending = db.query(SessionSnapshotDB).filter(
+            SessionSnapshotDB.session_id == session_id,
+            SessionSnapshotDB.checkpoint_id.isnot(None)
+        ).all()
+        for snapshot in pending:
+            await container_service.stop_container(snapshot.container_id, snapshot.docker_host)
+            snapshot.checkpoint_id = None
+            snapshot.mode = "filesystem"
     
     # Update session status
     session.status = "inactive"
     db.commit()
+    await websocket_manager.close_session(session_id)
+    
+    # Snapshot images stay while any session resumed from the same original is
+    # still active (its container may run from one) or snapshotted (it may be
+    # resumed); once the whole lineage has ended nothing can use them
+    tree = get_session_tree(db, session_id)
+    if all(member.status == "inactive" for member in tree):
+        snapshots = db.query(SessionSnapshotDB).filter(
+            SessionSnapshotDB.session_id.in_([member.id for member in tree])
+        ).all()
+        for snapshot in snapshots:
+            await container_service.remove_snapshot_image(snapshot.image, snapshot.docker_host)
+            db.delete(snapshot)
+        db.commit()
     
     return {"message": "Session ended successfully"}
 
+@app.post("/sessions/{session_id}/snapshot", response_model=SessionSnapshotResponse)
+async def snapshot_session(
+    session_id: str,
+    snapshot_data: SessionSnapshotCreate = SessionSnapshotCreate(),
+    db = Depends(get_db)
+):
+    """Snapshot the session container and end the session"""
+    session = db.query(SessionDB).filter(SessionDB.id == session_id).first()
+    if not session:
+        raise HTTPException(status_code=404, detail="Session not found")
+    if session.status != "active":
+        raise HTTPException(status_code=409, detail="Session is not active")
+    
+    try:
+        snapshot_info = await container_service.snapshot_container(
+            session.container_id,
+            session.id,
+            session.docker_host,
+            checkpoint=snapshot_data.checkpoint
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to snapshot session: {e}")
+    
+    snapshot = SessionSnapshotDB(
+        id=str(uuid.uuid4()),
+        session_id=session.id,
+        image=snapshot_info["image"],
+        docker_host=snapshot_info["host"],
+        container_id=snapshot_info["container_id"],
+        checkpoint_id=snapshot_info["checkpoint_id"],
+        vnc_port=session.vnc_port,
+        mode=snapshot_info["mode"],
+        created_at=datetime.utcnow()
+    )
+    db.add(snapshot)
+    session.status = "snapshotted"
+    db.commit()
+    await websocket_manager.close_session(session_id)
+    db.refresh(snapshot)
+    
+    return SessionSnapshotResponse(
+        id=snapshot.id,
+        session_id=snapshot.session_id,
+        image=snapshot.image,
+        mode=snapshot.mode,
+        created_at=snapshot.created_at
+    )
+
+@app.post("/sessions/{session_id}/resume", response_model=SessionResponse)
+async def resume_session(session_id: str, db = Depends(get_db)):
+    """Start a new session from the latest snapshot of this one, keeping its history"""
+    snapshot = db.query(SessionSnapshotDB).filter(
+        SessionSnapshotDB.session_id == session_id
+    ).order_by(SessionSnapshotDB.created_at.desc()).first()
+    if not snapshot:
+        raise HTTPException(status_code=404, detail="No snapshot found for session")
+    
+    try:
+        started = time.perf_counter()
+        container_info = await container_service.restore_container({
+            "image": snapshot.image,
+            "host": snapshot.docker_host,
+            "container_id": snapshot.container_id,
+            "checkpoint_id": snapshot.checkpoint_id,
+            "vnc_port": snapshot.vnc_port
+        })
+        
+        session = SessionDB(
+            id=str(uuid.uuid4()),
+            container_id=container_info["container_id"],
+            docker_host=container_info["host"],
+            vnc_port=container_info["vnc_port"],
+            status="active",
+            parent_session_id=session_id,
+            created_at=datetime.utcnow()
+        )
+        
+        # A CRIU checkpoint can only be restored once; later resumes use the image
+        if container_info["mode"] == "checkpoint":
+            snapshot.checkpoint_id = None
+            snapshot.mode = "filesystem"
+        
+        db.add(session)
+        db.commit()
+        db.refresh(session)
+        
+        return SessionResponse(
+            id=session.id,
+            status=session.status,
+            vnc_url=f"/vnc/{session.id}",
+            websocket_url=f"/ws/{session.id}",
+            created_at=session.created_at,
+            parent_session_id=session.parent_session_id,
+            startup_seconds=time.perf_counter() - started
+        )
+        
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 @app.get("/sessions/{session_id}/history")
 async def get_chat_history(session_id: str, db = Depends(get_db)):
-    """Get chat history for session"""
-    messages = db.query(ChatMessageDB).filter(
-        ChatMessageDB.session_id == session_id
-    ).order_by(ChatMessageDB.timestamp).all()
+    """Get chat history for session, including sessions it was resumed from
+
+    Messages of archived sessions are read back from their segment files.
+    """
+    messages = await archive_service.load_messages(db, get_session_lineage(db, session_id))
     
     return [
         {
-            "id": msg.id,
-            "role": msg.role,
-            "content": msg.content,
-            "timestamp": msg.timestamp,
-            "metadata": json.loads(msg.metadata) if msg.metadata else {}
+            "id": msg["id"],
+            "role": msg["role"],
+            "content": msg["content"],
+            "timestamp": msg["timestamp"],
+            "metadata": msg["metadata"]
         }
         for msg in messages
     ]
 
+@app.get("/search", response_model=SearchResponse)
+async def search_messages(
+    q: str = Query(..., min_length=1),
+    session_id: Optional[str] = None,
+    role: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    db = Depends(get_db)
+):
+    """Full-text search across all session transcripts, best matches first"""
+    return search_service.search(db, q, session_id, role, since, until, limit, offset)
+
+@app.get("/hosts")
+async def get_hosts():
+    """Get the number of agent containers running on each Docker host"""
+    return await container_service.get_host_loads()
+
 @app.websocket("/ws/{session_id}")
-async def websocket_endpoint(websocket: WebSocket, session_id: str):
-    """WebSocket endpoint for real-time agent communication"""
-    await websocket_manager.connect(websocket, session_id)
+async def websocket_endpoint(websocket: WebSocket, session_id: str, last_seq: Optional[int] = None):
+    """WebSocket endpoint for real-time agent communication
+
+    Reconnecting clients pass the last ``seq`` they received as ``last_seq`` to
+    get only the frames they missed.
+    """
+    db = next(get_db())
+    try:
+        session = db.query(SessionDB).filter(SessionDB.id == session_id).first()
+        session_active = session is not None and session.status == "active"
+    finally:
+        db.close()
+    if not session_active:
+        # Nothing can be sent to an ended session; the close code stops client reconnects
+        await websocket.accept()
+        await websocket.close(code=SESSION_ENDED_CLOSE_CODE)
+        return
     
     try:
+        await websocket_manager.connect(websocket, session_id, last_seq)
+        
         # Initialize agent service for this session
         agent_service = AgentService(session_id)
         
         while True:
-            # Receive message from client
-            data = await websocket.receive_text()
-            message_data = json.loads(data)
+            # Receive message from client (JSON or MessagePack, as negotiated)
+            message_data = await websocket_manager.receive_message(websocket)
             
             # Process message with agent
             async for response_chunk in agent_service.process_message(
@@ -144,7 +332,7 @@ async def websocket_endpoint(websocket: WebSocket, session_id: str):
     except Exception as e:
         print(f"WebSocket error: {e}")
     finally:
-        websocket_manager.disconnect(session_id)
+        websocket_manager.disconnect(session_id, websocket)
 
 if __name__ == "__main__":
     import uvicorn
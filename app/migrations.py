@@ -0,0 +1,113 @@
+"""
+Schema migrations, applied explicitly instead of at import time
+Run before starting workers: python -m app.migrations
+"""
+
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, Index, Integer, JSON, MetaData, String, Table, Text, text
+
+from .database import engine, ensure_chat_partitions
+from .services.search_service import SearchService
+
+# Arbitrary key so concurrent deploys on PostgreSQL apply migrations one at a time
+MIGRATION_LOCK_ID = 741_852_963
+
+def _create_tables(bind):
+    # A frozen copy of the initial schema, independent of the models in
+    # database.py; later model changes need their own migration
+    metadata = MetaData()
+    Table(
+        "sessions", metadata,
+        Column("id", String, primary_key=True),
+        Column("container_id", String, nullable=False),
+        Column("docker_host", String, nullable=True),
+        Column("vnc_port", Integer, nullable=False),
+        Column("status", String),
+        Column("parent_session_id", String, nullable=True),
+        Column("created_at", DateTime),
+    )
+    Table(
+        "chat_messages", metadata,
+        Column("id", String, primary_key=True),
+        Column("session_id", String, nullable=False),
+        Column("role", String, nullable=False),
+        Column("content", Text, nullable=False),
+        Column("timestamp", DateTime, primary_key=True),
+        Column("metadata", JSON),
+        Index("ix_chat_messages_session_timestamp", "session_id", "timestamp"),
+        postgresql_partition_by="RANGE (timestamp)",
+    )
+    Table(
+        "session_snapshots", metadata,
+        Column("id", String, primary_key=True),
+        Column("session_id", String, nullable=False, index=True),
+        Column("image", String, nullable=False),
+        Column("docker_host", String, nullable=True),
+        Column("container_id", String, nullable=False),
+        Column("checkpoint_id", String, nullable=True),
+        Column("vnc_port", Integer, nullable=False),
+        Column("mode", String, nullable=False),
+        Column("created_at", DateTime),
+    )
+    Table(
+        "chat_archive_segments", metadata,
+        Column("id", String, primary_key=True),
+        Column("session_id", String, nullable=False, index=True),
+        Column("path", String, nullable=False),
+        Column("message_count", Integer, nullable=False),
+        Column("first_timestamp", DateTime, nullable=False),
+        Column("last_timestamp", DateTime, nullable=False),
+        Column("created_at", DateTime),
+    )
+    metadata.create_all(bind=bind)
+
+def _create_search_index(bind):
+    SearchService(bind).ensure_index()
+
+# Append new migrations at the end; never reorder or edit applied ones
+MIGRATIONS = [
+    ("001", "create tables", _create_tables),
+    ("002", "chat message partitions", ensure_chat_partitions),
+    ("003", "full-text search index", _create_search_index),
+]
+
+def applied_migrations(bind) -> set:
+    with bind.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE IF NOT EXISTS schema_migrations ("
+            "version VARCHAR PRIMARY KEY, name VARCHAR NOT NULL, applied_at TIMESTAMP NOT NULL)"
+        ))
+        return {row[0] for row in conn.execute(text("SELECT version FROM schema_migrations"))}
+
+def run_migrations(bind=None) -> list:
+    """Apply pending migrations in order and return the versions applied"""
+    bind = bind or engine
+    is_postgres = bind.dialect.name == "postgresql"
+
+    with bind.connect() as lock_conn:
+        if is_postgres:
+            lock_conn.execute(text("SELECT pg_advisory_lock(:id)"), {"id": MIGRATION_LOCK_ID})
+        try:
+            done = applied_migrations(bind)
+            applied = []
+            for version, name, migrate in MIGRATIONS:
+                if version in done:
+                    continue
+                print(f"Applying migration {version}: {name}")
+                migrate(bind)
+                with bind.begin() as conn:
+                    conn.execute(
+                        text("INSERT INTO schema_migrations (version, name, applied_at) VALUES (:version, :name, :applied_at)"),
+                        {"version": version, "name": name, "applied_at": datetime.utcnow()}
+                    )
+                applied.append(version)
+            return applied
+        finally:
+            if is_postgres:
+                lock_conn.execute(text("SELECT pg_advisory_unlock(:id)"), {"id": MIGRATION_LOCK_ID})
+                lock_conn.commit()
+
+if __name__ == "__main__":
+    applied = run_migrations()
+    print(f"Applied {len(applied)} migration(s)" if applied else "Database is up to date")
@@ -1,6 +1,6 @@
 from pydantic import BaseModel
 from datetime import datetime
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 
 class SessionCreate(BaseModel):
     name: Optional[str] = None
@@ -12,6 +12,18 @@ class SessionResponse(BaseModel):
     vnc_url: str
     websocket_url: str
     created_at: datetime
+    parent_session_id: Optional[str] = None
+    startup_seconds: Optional[float] = None
+
+class SessionSnapshotCreate(BaseModel):
+    checkpoint: bool = False  # also save process memory via CRIU when available
+
+class SessionSnapshotResponse(BaseModel):
+    id: str
+    session_id: str
+    image: str
+    mode: str
+    created_at: datetime
 
 class ChatMessage(BaseModel):
     role: str  # "user" or "assistant"
@@ -24,3 +36,18 @@ class Session(BaseModel):
     vnc_port: int
     status: str
     created_at: datetime
+
+class SearchResult(BaseModel):
+    message_id: str
+    session_id: str
+    role: str
+    timestamp: datetime
+    rank: float
+    # HTML-escaped excerpt with matches in <b> tags; None for archived messages on PostgreSQL
+    snippet: Optional[str] = None
+
+class SearchResponse(BaseModel):
+    results: List[SearchResult]
+    total: int
+    limit: int
+    offset: int
@@ -0,0 +1,5 @@
+from .agent_service import AgentService
+from .archive_service import ArchiveService
+from .container_service import ContainerService
+from .search_service import SearchService
+from .vnc_service import VNCService
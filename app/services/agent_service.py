@@ -1,16 +1,30 @@
 import asyncio
 import json
 from typing import AsyncGenerator
-from anthropic import Anthropic
 import os
-from ..database import get_db, ChatMessageDB
+from ..database import get_db, get_session_lineage, ChatMessageDB
+from .archive_service import ArchiveService
 import uuid
 from datetime import datetime
 
+_anthropic_client = None
+
+def get_anthropic_client():
+    """Shared Anthropic client, imported and created on first use"""
+    global _anthropic_client
+    if _anthropic_client is None:
+        # The SDK is slow to import, keep it off the worker startup path
+        from anthropic import Anthropic
+        _anthropic_client = Anthropic(api_key=os.getenv("ANTHROPIC_API_KEY"))
+    return _anthropic_client
+
 class AgentService:
     def __init__(self, session_id: str):
         self.session_id = session_id
-        self.client = Anthropic(api_key=os.getenv("ANTHROPIC_API_KEY"))
+    
+    @property
+    def client(self):
+        return get_anthropic_client()
         
     async def process_message(self, user_message: str) -> AsyncGenerator[str, None]:
         """Process user message and stream agent response"""
@@ -20,11 +34,11 @@ class AgentService:
         
         try:
             # Get chat history for context
-            history = await self._get_chat_history()
+            history = await self._get_chat_history(limit=10)
             
             # Prepare messages for Claude
             messages = []
-            for msg in history[-10:]:  # Last 10 messages for context
+            for msg in history:  # Last 10 messages for context
                 messages.append({
                     "role": msg["role"],
                     "content": msg["content"]
@@ -81,19 +95,18 @@ class AgentService:
         finally:
             db.close()
     
-    async def _get_chat_history(self):
-        """Get chat history from database"""
+    async def _get_chat_history(self, limit: int):
+        """Get the latest ``limit`` messages of this session and the ones it was resumed from"""
         db = next(get_db())
         try:
-            messages = db.query(ChatMessageDB).filter(
-                ChatMessageDB.session_id == self.session_id
-            ).order_by(ChatMessageDB.timestamp).all()
+            lineage = await asyncio.to_thread(get_session_lineage, db, self.session_id)
+            messages = await ArchiveService().load_recent_messages(db, lineage, limit)
             
             return [
                 {
-                    "role": msg.role,
-                    "content": msg.content,
-                    "timestamp": msg.timestamp
+                    "role": msg["role"],
+                    "content": msg["content"],
+                    "timestamp": msg["timestamp"]
                 }
                 for msg in messages
             ]
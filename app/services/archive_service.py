@@ -0,0 +1,260 @@
+import asyncio
+import gzip
+import json
+import os
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Dict, List
+
+from sqlalchemy import func, text
+
+from ..database import SessionLocal, SessionDB, ChatMessageDB, ChatArchiveSegmentDB, engine, ensure_chat_partitions
+
+try:
+    import zstandard
+except ImportError:  # fall back to gzip segments when zstd is unavailable
+    zstandard = None
+
+ARCHIVE_DIR = os.getenv("CHAT_ARCHIVE_DIR", "data/chat_archive")
+ARCHIVE_AFTER_DAYS = float(os.getenv("CHAT_ARCHIVE_AFTER_DAYS", "7"))
+ARCHIVE_INTERVAL_SECONDS = int(os.getenv("CHAT_ARCHIVE_INTERVAL_SECONDS", "3600"))
+
+# Arbitrary key so only one worker runs a compaction pass at a time on PostgreSQL
+COMPACTION_LOCK_ID = 741_852_964
+
+class ArchiveService:
+    """Moves chat messages of inactive sessions into compressed JSONL segment files
+
+    The hot ``chat_messages`` table only keeps recent and active conversations.
+    Archived messages are listed in ``chat_archive_segments`` and read back
+    transparently by :meth:`load_messages`.
+    """
+
+    def __init__(self, archive_dir: str = ARCHIVE_DIR, archive_after: timedelta = timedelta(days=ARCHIVE_AFTER_DAYS)):
+        self.archive_dir = archive_dir
+        self.archive_after = archive_after
+
+    def _write_segment(self, path: str, lines: List[str]):
+        data = "".join(lines).encode("utf-8")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            if path.endswith(".zst"):
+                f.write(zstandard.ZstdCompressor(level=10).compress(data))
+            else:
+                f.write(gzip.compress(data))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+    def _read_segment(self, path: str) -> List[Dict[str, Any]]:
+        with open(path, "rb") as f:
+            data = f.read()
+        if path.endswith(".zst"):
+            data = zstandard.ZstdDecompressor().decompressobj().decompress(data)
+        else:
+            data = gzip.decompress(data)
+
+        messages = []
+        for line in data.decode("utf-8").splitlines():
+            record = json.loads(line)
+            record["timestamp"] = datetime.fromisoformat(record["timestamp"])
+            messages.append(record)
+        return messages
+
+    def archive_session(self, db, session_id: str, before: datetime = None) -> int:
+        """Archive a session's hot messages (older than ``before``) into one segment
+
+        The session row is locked for the whole pass (skipped if another worker
+        holds it), and the pass is rolled back if the rows it deletes are not
+        exactly the ones it wrote, so concurrent passes cannot archive twice.
+        """
+        locked = db.query(SessionDB.id).filter(
+            SessionDB.id == session_id
+        ).with_for_update(skip_locked=True).first()
+        if locked is None:
+            db.rollback()
+            return 0
+
+        query = db.query(ChatMessageDB).filter(ChatMessageDB.session_id == session_id)
+        if before is not None:
+            query = query.filter(ChatMessageDB.timestamp < before)
+        messages = query.order_by(ChatMessageDB.timestamp).all()
+        if not messages:
+            db.rollback()
+            return 0
+
+        lines = [
+            json.dumps({
+                "id": msg.id,
+                "session_id": msg.session_id,
+                "role": msg.role,
+                "content": msg.content,
+                "timestamp": msg.timestamp.isoformat(),
+                "metadata": msg.message_metadata or {}
+            }) + "\n"
+            for msg in messages
+        ]
+
+        segment_id = str(uuid.uuid4())
+        extension = "jsonl.zst" if zstandard is not None else "jsonl.gz"
+        path = os.path.join(self.archive_dir, session_id, f"{segment_id}.{extension}")
+
+        # The file is durable before the rows go away; a crash in between leaves
+        # an unreferenced file rather than lost messages
+        self._write_segment(path, lines)
+
+        try:
+            db.add(ChatArchiveSegmentDB(
+                id=segment_id,
+                session_id=session_id,
+                path=path,
+                message_count=len(messages),
+                first_timestamp=messages[0].timestamp,
+                last_timestamp=messages[-1].timestamp,
+                created_at=datetime.utcnow()
+            ))
+            deleted = db.query(ChatMessageDB).filter(
+                ChatMessageDB.session_id == session_id,
+                ChatMessageDB.id.in_([msg.id for msg in messages])
+            ).delete(synchronize_session=False)
+            if deleted != len(messages):
+                raise Exception(f"expected to delete {len(messages)} messages, deleted {deleted}")
+            db.commit()
+        except Exception:
+            db.rollback()
+            os.remove(path)
+            raise
+        return len(messages)
+
+    def compact(self, db) -> Dict[str, int]:
+        """Archive every inactive session whose last message is older than ``archive_after``"""
+        cutoff = datetime.utcnow() - self.archive_after
+        candidates = db.query(ChatMessageDB.session_id).join(
+            SessionDB, SessionDB.id == ChatMessageDB.session_id
+        ).filter(
+            SessionDB.status != "active"
+        ).group_by(ChatMessageDB.session_id).having(
+            func.max(ChatMessageDB.timestamp) < cutoff
+        ).all()
+
+        archived = {}
+        for (session_id,) in candidates:
+            try:
+                archived[session_id] = self.archive_session(db, session_id)
+            except Exception as e:
+                db.rollback()
+                print(f"Error archiving session {session_id}: {e}")
+        return archived
+
+    def _load_segment(self, segment: ChatArchiveSegmentDB) -> List[Dict[str, Any]]:
+        # Segment files live on local disk unless CHAT_ARCHIVE_DIR is shared
+        # storage, so a worker may not see every file; serve what is available
+        try:
+            return self._read_segment(segment.path)
+        except Exception as e:
+            print(f"Archive segment {segment.id} of session {segment.session_id} unavailable at {segment.path}: {e}")
+            return []
+
+    def _hot_messages(self, db, session_ids: List[str], limit: int = None) -> List[Dict[str, Any]]:
+        query = db.query(ChatMessageDB).filter(ChatMessageDB.session_id.in_(session_ids))
+        if limit is not None:
+            query = query.order_by(ChatMessageDB.timestamp.desc()).limit(limit)
+        return [
+            {
+                "id": msg.id,
+                "session_id": msg.session_id,
+                "role": msg.role,
+                "content": msg.content,
+                "timestamp": msg.timestamp,
+                "metadata": msg.message_metadata or {}
+            }
+            for msg in query.all()
+        ]
+
+    def _load_messages(self, db, session_ids: List[str]) -> List[Dict[str, Any]]:
+        messages = []
+        segments = db.query(ChatArchiveSegmentDB).filter(
+            ChatArchiveSegmentDB.session_id.in_(session_ids)
+        ).order_by(ChatArchiveSegmentDB.first_timestamp).all()
+        for segment in segments:
+            messages.extend(self._load_segment(segment))
+
+        messages.extend(self._hot_messages(db, session_ids))
+        messages.sort(key=lambda msg: msg["timestamp"])
+        return messages
+
+    def _load_recent_messages(self, db, session_ids: List[str], limit: int) -> List[Dict[str, Any]]:
+        messages = self._hot_messages(db, session_ids, limit)
+        if len(messages) < limit:
+            # Archived messages are older than the hot ones, newest segment first
+            segments = db.query(ChatArchiveSegmentDB).filter(
+                ChatArchiveSegmentDB.session_id.in_(session_ids)
+            ).order_by(ChatArchiveSegmentDB.last_timestamp.desc())
+            for segment in segments:
+                messages.extend(self._load_segment(segment))
+                if len(messages) >= limit:
+                    break
+
+        messages.sort(key=lambda msg: msg["timestamp"])
+        return messages[-limit:]
+
+    async def load_messages(self, db, session_ids: List[str]) -> List[Dict[str, Any]]:
+        """Messages for the given sessions from the archive and the hot table, oldest first
+
+        Segments whose file cannot be read are skipped and logged.
+        """
+        return await asyncio.to_thread(self._load_messages, db, session_ids)
+
+    async def load_recent_messages(self, db, session_ids: List[str], limit: int) -> List[Dict[str, Any]]:
+        """The last ``limit`` messages, oldest first, reading segments only if the hot table has too few"""
+        return await asyncio.to_thread(self._load_recent_messages, db, session_ids, limit)
+
+    def compact_once(self) -> Dict[str, int]:
+        """Roll chat partitions forward and run one compaction pass with its own session
+
+        Every worker runs the compaction loop, so on PostgreSQL a pass is skipped
+        when another worker already holds the compaction lock.
+        """
+        is_postgres = engine.dialect.name == "postgresql"
+        with engine.connect() as lock_conn:
+            if is_postgres:
+                acquired = lock_conn.execute(
+                    text("SELECT pg_try_advisory_lock(:id)"), {"id": COMPACTION_LOCK_ID}
+                ).scalar()
+                if not acquired:
+                    return {}
+
+            db = SessionLocal()
+            try:
+                try:
+                    ensure_chat_partitions()
+                except Exception as e:
+                    # Inserts still land in the default partition; retried next pass
+                    print(f"Error rolling chat_messages partitions forward: {e}")
+                return self.compact(db)
+            finally:
+                db.close()
+                if is_postgres:
+                    lock_conn.execute(text("SELECT pg_advisory_unlock(:id)"), {"id": COMPACTION_LOCK_ID})
+                    lock_conn.commit()
+
+    async def run_compaction_loop(self, interval: int = ARCHIVE_INTERVAL_SECONDS):
+        """Compact periodically without blocking the event loop
+
+        The first pass waits one interval so freshly started workers do not all
+        hit the database at once.
+        """
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                archived = await asyncio.to_thread(self.compact_once)
+                if archived:
+                    print(f"Archived {sum(archived.values())} messages from {len(archived)} sessions")
+            except Exception as e:
+                print(f"Chat compaction error: {e}")
+
+if __name__ == "__main__":
+    # One-off compaction: python -m app.services.archive_service
+    archived = ArchiveService().compact_once()
+    print(f"Archived {sum(archived.values())} messages from {len(archived)} sessions")
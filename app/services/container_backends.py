@@ -0,0 +1,232 @@
+import itertools
+import os
+import uuid
+from typing import Dict, List, Optional, Set
+
+MANAGED_LABEL = "cambioml.managed"
+# Keep calls to an unreachable host from hanging for docker-py's default 60s
+DOCKER_CLIENT_TIMEOUT = int(os.getenv("DOCKER_CLIENT_TIMEOUT", "10"))
+
+
+class ContainerBackend:
+    """A single place agent containers can run (one Docker daemon)"""
+
+    def __init__(self, name: str, capacity: int = 0):
+        self.name = name
+        self.capacity = capacity
+
+    def run(self, image: str, **kwargs):
+        raise NotImplementedError
+
+    def get(self, container_id: str):
+        raise NotImplementedError
+
+    def load(self) -> int:
+        """Number of agent containers currently running on this backend"""
+        raise NotImplementedError
+
+    def commit(self, container_id: str, repository: str, tag: str) -> str:
+        """Save the container filesystem as an image and return its reference"""
+        raise NotImplementedError
+
+    def remove_image(self, image: str):
+        """Delete an image created by :meth:`commit`"""
+        raise NotImplementedError
+
+    def checkpoint(self, container_id: str, checkpoint_id: str):
+        """CRIU checkpoint of the running container; the container exits afterwards"""
+        raise NotImplementedError
+
+    def restore(self, container_id: str, checkpoint_id: str):
+        """Start a checkpointed container from its saved memory state"""
+        raise NotImplementedError
+
+    def has_capacity(self) -> bool:
+        return self.capacity <= 0 or self.load() < self.capacity
+
+
+class DockerBackend(ContainerBackend):
+    """Docker daemon reachable through a base URL, or the local environment"""
+
+    def __init__(self, base_url: Optional[str] = None, name: Optional[str] = None, capacity: int = 0):
+        super().__init__(name or base_url or "local", capacity)
+        self.base_url = base_url
+        self._client = None
+
+    @property
+    def client(self):
+        # Connect on first use so an unreachable host does not block the others
+        if self._client is None:
+            import docker
+
+            if self.base_url:
+                self._client = docker.DockerClient(base_url=self.base_url, timeout=DOCKER_CLIENT_TIMEOUT)
+            else:
+                self._client = docker.from_env(timeout=DOCKER_CLIENT_TIMEOUT)
+        return self._client
+
+    def run(self, image: str, **kwargs):
+        labels = dict(kwargs.pop("labels", None) or {})
+        labels[MANAGED_LABEL] = "true"
+        return self.client.containers.run(image, labels=labels, **kwargs)
+
+    def get(self, container_id: str):
+        return self.client.containers.get(container_id)
+
+    def load(self) -> int:
+        return len(self.client.containers.list(filters={"label": f"{MANAGED_LABEL}=true"}))
+
+    def commit(self, container_id: str, repository: str, tag: str) -> str:
+        self.get(container_id).commit(repository=repository, tag=tag)
+        return f"{repository}:{tag}"
+
+    def remove_image(self, image: str):
+        self.client.images.remove(image)
+
+    # docker-py has no checkpoint API, so talk to the engine endpoints directly.
+    # These require an experimental daemon with CRIU installed.
+    def checkpoint(self, container_id: str, checkpoint_id: str):
+        api = self.client.api
+        response = api._post_json(
+            api._url("/containers/{0}/checkpoints", container_id),
+            data={"CheckpointID": checkpoint_id, "Exit": True},
+        )
+        api._raise_for_status(response)
+
+    def restore(self, container_id: str, checkpoint_id: str):
+        api = self.client.api
+        response = api._post(
+            api._url("/containers/{0}/start", container_id),
+            params={"checkpoint": checkpoint_id},
+        )
+        api._raise_for_status(response)
+
+
+class FakeContainer:
+    """In-memory stand-in for a docker container"""
+
+    def __init__(self, backend: "FakeBackend", image: str, **kwargs):
+        self.id = uuid.uuid4().hex
+        self.image = image
+        self.status = "running"
+        self.attrs = kwargs
+        self.checkpoints: List[str] = []
+        self._backend = backend
+
+    def stop(self):
+        self.status = "exited"
+
+    def remove(self):
+        self._backend.containers.pop(self.id, None)
+
+
+class FakeBackend(ContainerBackend):
+    """Backend that never touches Docker, for local multi-host testing"""
+
+    def __init__(self, name: str, capacity: int = 0):
+        super().__init__(name, capacity)
+        self.containers: Dict[str, FakeContainer] = {}
+        self.images: Set[str] = set()
+
+    def run(self, image: str, **kwargs):
+        container = FakeContainer(self, image, **kwargs)
+        self.containers[container.id] = container
+        return container
+
+    def get(self, container_id: str):
+        if container_id not in self.containers:
+            raise KeyError(container_id)
+        return self.containers[container_id]
+
+    def load(self) -> int:
+        return sum(1 for c in self.containers.values() if c.status == "running")
+
+    def commit(self, container_id: str, repository: str, tag: str) -> str:
+        self.get(container_id)
+        image = f"{repository}:{tag}"
+        self.images.add(image)
+        return image
+
+    def remove_image(self, image: str):
+        if any(c.image == image for c in self.containers.values()):
+            raise Exception(f"Image {image} is used by a container")
+        self.images.remove(image)
+
+    def checkpoint(self, container_id: str, checkpoint_id: str):
+        container = self.get(container_id)
+        container.checkpoints.append(checkpoint_id)
+        container.status = "exited"
+
+    def restore(self, container_id: str, checkpoint_id: str):
+        container = self.get(container_id)
+        if checkpoint_id not in container.checkpoints:
+            raise KeyError(checkpoint_id)
+        container.status = "running"
+
+
+class Scheduler:
+    """Chooses the backend a new session is placed on
+
+    ``loads`` maps each host name to its agent containers, running or being
+    started, and is -1 for hosts that could not be reached. Schedulers only
+    look at ``loads`` and never call the hosts themselves.
+    """
+
+    def select(self, backends: List[ContainerBackend], loads: Dict[str, int]) -> ContainerBackend:
+        raise NotImplementedError
+
+
+class LeastLoadedScheduler(Scheduler):
+    def select(self, backends: List[ContainerBackend], loads: Dict[str, int]) -> ContainerBackend:
+        candidates = []
+        for backend in backends:
+            load = loads.get(backend.name, -1)
+            if load < 0:
+                continue
+            if backend.capacity > 0 and load >= backend.capacity:
+                continue
+            candidates.append((load, backend))
+
+        if not candidates:
+            raise Exception("No container host has free capacity")
+
+        return min(candidates, key=lambda item: item[0])[1]
+
+
+class RoundRobinScheduler(Scheduler):
+    def __init__(self):
+        self._counter = itertools.count()
+
+    def select(self, backends: List[ContainerBackend], loads: Dict[str, int]) -> ContainerBackend:
+        if not backends:
+            raise Exception("No container hosts configured")
+        return backends[next(self._counter) % len(backends)]
+
+
+SCHEDULERS = {
+    "least_loaded": LeastLoadedScheduler,
+    "round_robin": RoundRobinScheduler,
+}
+
+
+def backend_from_url(url: str, capacity: int = 0) -> ContainerBackend:
+    """Build a backend from a DOCKER_HOSTS entry (``local``, ``fake://name`` or a docker URL)"""
+    url = url.strip()
+    if url in ("", "local"):
+        return DockerBackend(name="local", capacity=capacity)
+    if url.startswith("fake://"):
+        return FakeBackend(url, capacity=capacity)
+    return DockerBackend(base_url=url, capacity=capacity)
+
+
+def backends_from_env() -> List[ContainerBackend]:
+    hosts = os.getenv("DOCKER_HOSTS", "local")
+    capacity = int(os.getenv("DOCKER_HOST_CAPACITY", "0"))
+    return [backend_from_url(url, capacity) for url in hosts.split(",") if url.strip()]
+
+
+def scheduler_from_env() -> Scheduler:
+    name = os.getenv("CONTAINER_SCHEDULER", "least_loaded")
+    if name not in SCHEDULERS:
+        raise ValueError(f"Unknown container scheduler: {name}")
+    return SCHEDULERS[name]()
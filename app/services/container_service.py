@@ -1,61 +1,184 @@
-import docker
 import asyncio
-from typing import Dict
+import os
+from typing import Any, Dict, List, Optional
 import random
 
+from .container_backends import ContainerBackend, Scheduler, backends_from_env, scheduler_from_env
+
+AGENT_IMAGE = "ghcr.io/anthropics/anthropic-quickstarts:computer-use-demo"
+SNAPSHOT_REPOSITORY = os.getenv("SNAPSHOT_REPOSITORY", "cambioml-snapshots")
+# Time given to the VNC server in a new container before the session is handed out
+CONTAINER_READY_WAIT_SECONDS = float(os.getenv("CONTAINER_READY_WAIT_SECONDS", "5"))
+
 class ContainerService:
-    def __init__(self):
-        self.client = docker.from_env()
-        
-    async def create_container(self) -> Dict[str, str]:
-        """Create a new container with VNC server"""
-        
+    def __init__(self, backends: Optional[List[ContainerBackend]] = None, scheduler: Optional[Scheduler] = None):
+        self.backends = backends if backends is not None else backends_from_env()
+        self.scheduler = scheduler or scheduler_from_env()
+        # Containers being started per host, and containers started per host
+        # so far; placement counts both so concurrent creates cannot exceed a
+        # host's capacity
+        self.pending: Dict[str, int] = {}
+        self.started: Dict[str, int] = {}
+
+    def get_backend(self, host: Optional[str] = None) -> ContainerBackend:
+        """Look up a backend by name, defaulting to the first configured host"""
+        if host is None:
+            return self.backends[0]
+        for backend in self.backends:
+            if backend.name == host:
+                return backend
+        raise Exception(f"Unknown container host: {host}")
+
+    async def create_container(self, image: str = AGENT_IMAGE, host: Optional[str] = None) -> Dict[str, str]:
+        """Create a new container with VNC server on the given or least busy host"""
+
         # Generate random VNC port
         vnc_port = random.randint(5900, 6000)
-        
+
         try:
-            # Create container based on the anthropic computer use demo
-            container = self.client.containers.run(
-                "ghcr.io/anthropics/anthropic-quickstarts:computer-use-demo",
-                detach=True,
-                ports={
-                    '5900/tcp': vnc_port,  # VNC port
-                    '6080/tcp': vnc_port + 1000,  # noVNC web port
-                },
-                environment={
-                    'DISPLAY': ':1',
-                    'VNC_PASSWORD': 'password123'
-                },
-                volumes={
-                    '/tmp/.X11-unix': {'bind': '/tmp/.X11-unix', 'mode': 'rw'}
-                }
-            )
-            
+            if host:
+                backend = self.get_backend(host)
+            else:
+                # Hosts are polled concurrently, and not under any lock, so a slow
+                # host delays only this request by at most its client timeout
+                started_before_poll = dict(self.started)
+                loads = await self.get_host_loads()
+                # No await from here to the reservation, so placements cannot
+                # interleave. Containers started since the poll are not in its
+                # counts yet, and ones still starting are in pending
+                for name, load in loads.items():
+                    if load >= 0:
+                        loads[name] = (
+                            load + self.pending.get(name, 0)
+                            + self.started.get(name, 0) - started_before_poll.get(name, 0)
+                        )
+                backend = self.scheduler.select(self.backends, loads)
+            self.pending[backend.name] = self.pending.get(backend.name, 0) + 1
+
+            try:
+                # Create container based on the anthropic computer use demo
+                container = await asyncio.to_thread(
+                    backend.run,
+                    image,
+                    detach=True,
+                    ports={
+                        '5900/tcp': vnc_port,  # VNC port
+                        '6080/tcp': vnc_port + 1000,  # noVNC web port
+                    },
+                    environment={
+                        'DISPLAY': ':1',
+                        'VNC_PASSWORD': 'password123'
+                    },
+                    volumes={
+                        '/tmp/.X11-unix': {'bind': '/tmp/.X11-unix', 'mode': 'rw'}
+                    }
+                )
+                self.started[backend.name] = self.started.get(backend.name, 0) + 1
+            finally:
+                self.pending[backend.name] -= 1
+
             # Wait for container to be ready
-            await asyncio.sleep(5)
-            
+            await asyncio.sleep(CONTAINER_READY_WAIT_SECONDS)
+
             return {
                 "container_id": container.id,
+                "host": backend.name,
                 "vnc_port": vnc_port,
                 "novnc_port": vnc_port + 1000
             }
-            
+
         except Exception as e:
             raise Exception(f"Failed to create container: {str(e)}")
-    
-    async def stop_container(self, container_id: str):
+
+    async def stop_container(self, container_id: str, host: Optional[str] = None):
         """Stop and remove container"""
         try:
-            container = self.client.containers.get(container_id)
-            container.stop()
-            container.remove()
+            await asyncio.to_thread(self._stop_and_remove, self.get_backend(host), container_id)
         except Exception as e:
             print(f"Error stopping container {container_id}: {e}")
-    
-    async def get_container_status(self, container_id: str) -> str:
+
+    def _stop_and_remove(self, backend: ContainerBackend, container_id: str):
+        container = backend.get(container_id)
+        container.stop()
+        container.remove()
+
+    async def get_container_status(self, container_id: str, host: Optional[str] = None) -> str:
         """Get container status"""
         try:
-            container = self.client.containers.get(container_id)
+            container = await asyncio.to_thread(self.get_backend(host).get, container_id)
             return container.status
         except:
             return "not_found"
+
+    async def snapshot_container(self, container_id: str, session_id: str, host: Optional[str] = None, checkpoint: bool = False) -> Dict[str, Any]:
+        """Save container state for a later resume and release the container
+
+        The filesystem is always committed to an image. With ``checkpoint`` the
+        process memory is also saved via CRIU and the exited container is kept
+        so it can be restarted in place; if CRIU is unavailable we fall back to
+        the filesystem snapshot alone.
+        """
+        backend = self.get_backend(host)
+        image = await asyncio.to_thread(backend.commit, container_id, SNAPSHOT_REPOSITORY, session_id)
+
+        checkpoint_id = None
+        if checkpoint:
+            try:
+                checkpoint_id = f"session-{session_id}"
+                await asyncio.to_thread(backend.checkpoint, container_id, checkpoint_id)
+            except Exception as e:
+                print(f"Checkpoint unavailable for {container_id}, using filesystem snapshot: {e}")
+                checkpoint_id = None
+
+        if checkpoint_id is None:
+            await self.stop_container(container_id, backend.name)
+
+        return {
+            "image": image,
+            "host": backend.name,
+            "container_id": container_id,
+            "checkpoint_id": checkpoint_id,
+            "mode": "checkpoint" if checkpoint_id else "filesystem",
+        }
+
+    async def remove_snapshot_image(self, image: str, host: Optional[str] = None):
+        """Delete a snapshot image once nothing can resume from it"""
+        try:
+            await asyncio.to_thread(self.get_backend(host).remove_image, image)
+        except Exception as e:
+            print(f"Error removing snapshot image {image}: {e}")
+
+    async def restore_container(self, snapshot: Dict[str, Any]) -> Dict[str, str]:
+        """Bring a snapshot back up, preferring the in-place CRIU restore"""
+        if snapshot.get("checkpoint_id"):
+            try:
+                backend = self.get_backend(snapshot["host"])
+                await asyncio.to_thread(backend.restore, snapshot["container_id"], snapshot["checkpoint_id"])
+                return {
+                    "container_id": snapshot["container_id"],
+                    "host": backend.name,
+                    "vnc_port": snapshot["vnc_port"],
+                    "novnc_port": snapshot["vnc_port"] + 1000,
+                    "mode": "checkpoint"
+                }
+            except Exception as e:
+                print(f"Checkpoint restore failed, starting from filesystem snapshot: {e}")
+
+        # Snapshot images are not pushed anywhere, so they only exist on the host that made them
+        container_info = await self.create_container(image=snapshot["image"], host=snapshot["host"])
+        container_info["mode"] = "filesystem"
+        return container_info
+
+    async def get_host_loads(self) -> Dict[str, int]:
+        """Running agent containers per host, -1 for unreachable hosts"""
+        results = await asyncio.gather(
+            *(asyncio.to_thread(backend.load) for backend in self.backends),
+            return_exceptions=True
+        )
+        loads = {}
+        for backend, load in zip(self.backends, results):
+            if isinstance(load, Exception):
+                print(f"Container host {backend.name} unreachable: {load}")
+                load = -1
+            loads[backend.name] = load
+        return loads
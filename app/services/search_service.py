@@ -0,0 +1,198 @@
+import html
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import text
+
+from ..database import engine
+
+# The index lives in its own table, filled by a trigger on chat_messages, so
+# messages stay searchable after the archive job removes them from the hot table.
+POSTGRES_SETUP = [
+    """
+    CREATE TABLE IF NOT EXISTS chat_message_search (
+        message_id VARCHAR PRIMARY KEY,
+        session_id VARCHAR NOT NULL,
+        role VARCHAR NOT NULL,
+        timestamp TIMESTAMP NOT NULL,
+        document TSVECTOR NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_chat_message_search_document ON chat_message_search USING GIN (document)",
+    "CREATE INDEX IF NOT EXISTS ix_chat_message_search_session_timestamp ON chat_message_search (session_id, timestamp)",
+    """
+    CREATE OR REPLACE FUNCTION chat_message_search_insert() RETURNS trigger AS $$
+    BEGIN
+        INSERT INTO chat_message_search (message_id, session_id, role, timestamp, document)
+        VALUES (NEW.id, NEW.session_id, NEW.role, NEW.timestamp, to_tsvector('english', NEW.content))
+        ON CONFLICT (message_id) DO NOTHING;
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS chat_messages_search_insert ON chat_messages",
+    """
+    CREATE TRIGGER chat_messages_search_insert AFTER INSERT ON chat_messages
+    FOR EACH ROW EXECUTE FUNCTION chat_message_search_insert()
+    """,
+    # Backfill messages written before the trigger existed
+    """
+    INSERT INTO chat_message_search (message_id, session_id, role, timestamp, document)
+    SELECT id, session_id, role, timestamp, to_tsvector('english', content) FROM chat_messages
+    ON CONFLICT (message_id) DO NOTHING
+    """,
+]
+
+# Snippets mark matches with these control characters; the text is HTML-escaped
+# afterwards and only then are the marks turned into <b> tags
+HIGHLIGHT_START = "\x02"
+HIGHLIGHT_STOP = "\x03"
+
+SQLITE_SETUP = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS chat_message_search USING fts5(
+        content, message_id UNINDEXED, session_id UNINDEXED, role UNINDEXED, timestamp UNINDEXED
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS chat_messages_search_insert AFTER INSERT ON chat_messages
+    BEGIN
+        INSERT INTO chat_message_search (content, message_id, session_id, role, timestamp)
+        VALUES (NEW.content, NEW.id, NEW.session_id, NEW.role, NEW.timestamp);
+    END
+    """,
+]
+
+class SearchService:
+    """Ranked full-text search over chat transcripts
+
+    Uses a tsvector/GIN index on PostgreSQL and FTS5 on SQLite. Messages are
+    indexed by a database trigger as they are inserted.
+    """
+
+    def __init__(self, bind=None):
+        self.bind = bind or engine
+
+    @property
+    def dialect(self) -> str:
+        return self.bind.dialect.name
+
+    def ensure_index(self):
+        """Create the search table, trigger and backfill if they do not exist yet"""
+        if self.dialect == "postgresql":
+            statements = POSTGRES_SETUP
+        elif self.dialect == "sqlite":
+            statements = SQLITE_SETUP
+        else:
+            raise Exception(f"Full-text search is not supported on {self.dialect}")
+
+        with self.bind.begin() as conn:
+            for statement in statements:
+                conn.execute(text(statement))
+
+    def search(
+        self,
+        db,
+        query: str,
+        session_id: Optional[str] = None,
+        role: Optional[str] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        limit: int = 20,
+        offset: int = 0
+    ) -> Dict[str, Any]:
+        """Best matching messages first, with the total match count for paging"""
+        if self.dialect == "postgresql":
+            return self._search_postgres(db, query, session_id, role, since, until, limit, offset)
+        return self._search_sqlite(db, query, session_id, role, since, until, limit, offset)
+
+    def _filters(self, session_id, role, since, until, column_prefix: str, timestamp_format=None):
+        clauses, params = [], {}
+        if session_id:
+            clauses.append(f"{column_prefix}session_id = :session_id")
+            params["session_id"] = session_id
+        if role:
+            clauses.append(f"{column_prefix}role = :role")
+            params["role"] = role
+        if since:
+            clauses.append(f"{column_prefix}timestamp >= :since")
+            params["since"] = timestamp_format(since) if timestamp_format else since
+        if until:
+            clauses.append(f"{column_prefix}timestamp < :until")
+            params["until"] = timestamp_format(until) if timestamp_format else until
+        return "".join(f" AND {clause}" for clause in clauses), params
+
+    def _search_postgres(self, db, query, session_id, role, since, until, limit, offset):
+        where, params = self._filters(session_id, role, since, until, "s.")
+        params.update(
+            query=query, limit=limit, offset=offset,
+            headline_options=f'StartSel="{HIGHLIGHT_START}", StopSel="{HIGHLIGHT_STOP}"'
+        )
+
+        total = db.execute(text(
+            "SELECT count(*) FROM chat_message_search s "
+            "WHERE s.document @@ websearch_to_tsquery('english', :query)" + where
+        ), params).scalar()
+
+        # Archived messages have no hot row, so they come back without a snippet
+        rows = db.execute(text(
+            "SELECT s.message_id, s.session_id, s.role, s.timestamp, "
+            "ts_rank(s.document, q) AS rank, ts_headline('english', m.content, q, :headline_options) AS snippet "
+            "FROM chat_message_search s "
+            "CROSS JOIN websearch_to_tsquery('english', :query) q "
+            "LEFT JOIN chat_messages m ON m.id = s.message_id AND m.timestamp = s.timestamp "
+            "WHERE s.document @@ q" + where +
+            " ORDER BY rank DESC, s.timestamp DESC LIMIT :limit OFFSET :offset"
+        ), params).all()
+
+        return self._response(rows, total, limit, offset)
+
+    def _search_sqlite(self, db, query, session_id, role, since, until, limit, offset):
+        # SQLAlchemy stores SQLite datetimes as "YYYY-MM-DD HH:MM:SS.ffffff" strings
+        where, params = self._filters(
+            session_id, role, since, until, "",
+            timestamp_format=lambda value: value.isoformat(sep=" ", timespec="microseconds")
+        )
+        params.update(
+            query=self._fts5_query(query), limit=limit, offset=offset,
+            highlight_start=HIGHLIGHT_START, highlight_stop=HIGHLIGHT_STOP
+        )
+
+        total = db.execute(text(
+            "SELECT count(*) FROM chat_message_search WHERE chat_message_search MATCH :query" + where
+        ), params).scalar()
+
+        rows = db.execute(text(
+            "SELECT message_id, session_id, role, timestamp, -bm25(chat_message_search) AS rank, "
+            "snippet(chat_message_search, 0, :highlight_start, :highlight_stop, '...', 16) AS snippet "
+            "FROM chat_message_search WHERE chat_message_search MATCH :query" + where +
+            " ORDER BY rank DESC, timestamp DESC LIMIT :limit OFFSET :offset"
+        ), params).all()
+
+        return self._response(rows, total, limit, offset)
+
+    def _fts5_query(self, query: str) -> str:
+        # Quote every term so user input cannot trip the FTS5 query syntax
+        terms = ['"' + term.replace('"', '""') + '"' for term in query.split()]
+        return " ".join(terms) or '""'
+
+    def _highlight(self, snippet: Optional[str]) -> Optional[str]:
+        # Message content is untrusted, so the snippet is safe to render as HTML
+        # with only the <b> match highlights as markup
+        if snippet is None:
+            return None
+        return html.escape(snippet).replace(HIGHLIGHT_START, "<b>").replace(HIGHLIGHT_STOP, "</b>")
+
+    def _response(self, rows, total: int, limit: int, offset: int) -> Dict[str, Any]:
+        results: List[Dict[str, Any]] = [
+            {
+                "message_id": row.message_id,
+                "session_id": row.session_id,
+                "role": row.role,
+                "timestamp": row.timestamp,
+                "rank": float(row.rank),
+                "snippet": self._highlight(row.snippet)
+            }
+            for row in rows
+        ]
+        return {"results": results, "total": total, "limit": limit, "offset": offset}
@@ -1,29 +1,178 @@
-from fastapi import WebSocket
-from typing import Dict, List
-import json
+from fastapi import WebSocket, WebSocketDisconnect
+from collections import OrderedDict, deque
+from typing import Deque, Dict, List, Optional
+import os
+import time
+
+from .ws_protocol import JSON_CODEC, negotiate_codec
+
+REPLAY_BUFFER_SIZE = int(os.getenv("WS_REPLAY_BUFFER_SIZE", "1000"))
+# How long a session's replay state outlives its last connection
+REPLAY_TTL_SECONDS = float(os.getenv("WS_REPLAY_TTL_SECONDS", "300"))
+# Application close code (4000-4999 range) telling clients the session has
+# ended and they should not reconnect
+SESSION_ENDED_CLOSE_CODE = 4000
 
 class WebSocketManager:
-    def __init__(self):
+    def __init__(self, replay_buffer_size: int = REPLAY_BUFFER_SIZE, replay_ttl: float = REPLAY_TTL_SECONDS):
         self.active_connections: Dict[str, List[WebSocket]] = {}
-    
-    async def connect(self, websocket: WebSocket, session_id: str):
-        await websocket.accept()
+        self.codecs: Dict[WebSocket, object] = {}
+        # Every frame sent to a session gets the next sequence number and is kept
+        # in a bounded buffer so reconnecting clients can catch up
+        self.replay_buffer_size = replay_buffer_size
+        self.sequences: Dict[str, int] = {}
+        self.replay_buffers: Dict[str, Deque[dict]] = {}
+        # Sessions without connections, oldest first, with the time they went
+        # idle; their replay state is evicted once ``replay_ttl`` has passed
+        self.replay_ttl = replay_ttl
+        self.idle_since: "OrderedDict[str, float]" = OrderedDict()
+
+    async def connect(self, websocket: WebSocket, session_id: str, last_seq: Optional[int] = None):
+        codec, subprotocol = negotiate_codec(
+            websocket.scope.get("subprotocols", []),
+            websocket.query_params.get("encoding")
+        )
+        await websocket.accept(subprotocol=subprotocol)
+        self.codecs[websocket] = codec
+
+        if last_seq is not None:
+            await self.replay(websocket, session_id, last_seq)
+
+        # No await between catching up and registering, see replay()
         if session_id not in self.active_connections:
             self.active_connections[session_id] = []
         self.active_connections[session_id].append(websocket)
-    
+        self.idle_since.pop(session_id, None)
+        self.evict_idle()
+
     def disconnect(self, session_id: str, websocket: WebSocket = None):
+        if websocket:
+            self.codecs.pop(websocket, None)
         if session_id in self.active_connections:
             if websocket:
-                self.active_connections[session_id].remove(websocket)
+                if websocket in self.active_connections[session_id]:
+                    self.active_connections[session_id].remove(websocket)
             else:
+                for connection in self.active_connections[session_id]:
+                    self.codecs.pop(connection, None)
                 self.active_connections[session_id] = []
-    
+            if not self.active_connections[session_id]:
+                del self.active_connections[session_id]
+                self._mark_idle(session_id)
+        self.evict_idle()
+
+    def _mark_idle(self, session_id: str):
+        if session_id not in self.idle_since and session_id in self.sequences:
+            self.idle_since[session_id] = time.monotonic()
+
+    def evict_idle(self, now: Optional[float] = None):
+        """Drop replay state of sessions that have had no connection for ``replay_ttl``
+
+        A client reconnecting later gets ``resync_required`` and reloads history.
+        """
+        now = time.monotonic() if now is None else now
+        while self.idle_since:
+            session_id, since = next(iter(self.idle_since.items()))
+            if now - since < self.replay_ttl:
+                break
+            del self.idle_since[session_id]
+            self.sequences.pop(session_id, None)
+            self.replay_buffers.pop(session_id, None)
+
+    async def close_session(self, session_id: str):
+        """Close every connection of a session that has ended and drop its replay state
+
+        The sockets are closed with :data:`SESSION_ENDED_CLOSE_CODE`, which ends
+        their receive loops; each endpoint then forgets its own codec.
+        """
+        connections = self.active_connections.pop(session_id, [])
+        self.idle_since.pop(session_id, None)
+        self.sequences.pop(session_id, None)
+        self.replay_buffers.pop(session_id, None)
+        for connection in connections:
+            try:
+                await connection.close(code=SESSION_ENDED_CLOSE_CODE)
+            except:
+                # Already closed by the client
+                pass
+
+    async def replay(self, websocket: WebSocket, session_id: str, last_seq: int):
+        """Send the frames a reconnecting client missed after ``last_seq``
+
+        Other connections may keep producing frames while we await sends, so
+        each pass works on a snapshot of the buffer and we loop until the client
+        has caught up. The caller must register the socket right after this
+        returns, with no await in between, so no frame falls in the gap.
+
+        If the buffer no longer holds every missed frame the client is told to
+        resync from the history endpoint instead.
+        """
+        sent_seq = last_seq
+        while True:
+            current_seq = self.sequences.get(session_id, 0)
+            if sent_seq > current_seq:
+                # The client is ahead of us (e.g. the server restarted)
+                await self._send(websocket, {"type": "resync_required", "seq": current_seq})
+                sent_seq = current_seq
+                continue
+            if sent_seq == current_seq:
+                return
+
+            buffer = list(self.replay_buffers.get(session_id, ()))
+            pending = [message for message in buffer if message["seq"] > sent_seq]
+            if not pending or pending[0]["seq"] != sent_seq + 1:
+                # Missed frames were evicted, possibly while we were replaying;
+                # the client reloads history up to current_seq and we go on from there
+                await self._send(websocket, {"type": "resync_required", "seq": current_seq})
+                sent_seq = current_seq
+                continue
+
+            for message in pending:
+                await self._send(websocket, message)
+            sent_seq = pending[-1]["seq"]
+
+    async def receive_message(self, websocket: WebSocket) -> dict:
+        """Receive and decode one frame from the client"""
+        codec = self.codecs.get(websocket, JSON_CODEC)
+        message = await websocket.receive()
+        if message["type"] == "websocket.disconnect":
+            raise WebSocketDisconnect(message.get("code", 1000))
+        if message.get("bytes") is not None:
+            return codec.decode(message["bytes"])
+        return codec.decode(message["text"])
+
     async def send_message(self, session_id: str, message: dict):
-        if session_id in self.active_connections:
-            for connection in self.active_connections[session_id]:
+        seq = self.sequences.get(session_id, 0) + 1
+        self.sequences[session_id] = seq
+        message = {**message, "seq": seq}
+
+        if session_id not in self.replay_buffers:
+            self.replay_buffers[session_id] = deque(maxlen=self.replay_buffer_size)
+        self.replay_buffers[session_id].append(message)
+
+        if session_id not in self.active_connections:
+            # Frames produced with nobody connected (e.g. the agent finishing a
+            # turn after the tab closed) are kept only for the grace period
+            self._mark_idle(session_id)
+        else:
+            # Encode once per wire format, not once per connection
+            encoded = {}
+            for connection in list(self.active_connections[session_id]):
+                codec = self.codecs.get(connection, JSON_CODEC)
+                if codec.name not in encoded:
+                    encoded[codec.name] = codec.encode(message)
                 try:
-                    await connection.send_text(json.dumps(message))
+                    if codec.binary:
+                        await connection.send_bytes(encoded[codec.name])
+                    else:
+                        await connection.send_text(encoded[codec.name])
                 except:
-                    # Remove dead connections
-                    self.active_connections[session_id].remove(connection)
+                    # Remove dead connections, the frame stays in the replay buffer
+                    self.disconnect(session_id, connection)
+
+    async def _send(self, websocket: WebSocket, message: dict):
+        codec = self.codecs.get(websocket, JSON_CODEC)
+        if codec.binary:
+            await websocket.send_bytes(codec.encode(message))
+        else:
+            await websocket.send_text(codec.encode(message))
@@ -0,0 +1,67 @@
+import base64
+import json
+from typing import Any, List, Optional, Union
+
+try:
+    import msgpack
+except ImportError:  # msgpack is optional, JSON always works
+    msgpack = None
+
+def _json_default(value: Any):
+    # Binary attachments (screenshots, files) travel as base64 in JSON frames
+    if isinstance(value, (bytes, bytearray)):
+        return base64.b64encode(value).decode("ascii")
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+class JSONCodec:
+    """Text frames containing JSON, the default wire format"""
+
+    name = "json"
+    subprotocol = "cambioml.json"
+    binary = False
+
+    def encode(self, message: dict) -> str:
+        return json.dumps(message, default=_json_default, separators=(",", ":"))
+
+    def decode(self, data: Union[str, bytes]) -> dict:
+        return json.loads(data)
+
+class MsgPackCodec:
+    """Binary MessagePack frames; bytes values are sent as raw bin fields"""
+
+    name = "msgpack"
+    subprotocol = "cambioml.msgpack"
+    binary = True
+
+    def encode(self, message: dict) -> bytes:
+        return msgpack.packb(message, use_bin_type=True)
+
+    def decode(self, data: Union[str, bytes]) -> dict:
+        if isinstance(data, str):
+            # Clients may still send JSON text frames on a msgpack connection
+            return json.loads(data)
+        return msgpack.unpackb(data, raw=False)
+
+JSON_CODEC = JSONCodec()
+
+def available_codecs() -> List[Union[JSONCodec, MsgPackCodec]]:
+    """Codecs in server preference order"""
+    codecs = [JSON_CODEC]
+    if msgpack is not None:
+        codecs.insert(0, MsgPackCodec())
+    return codecs
+
+def negotiate_codec(subprotocols: List[str], encoding: Optional[str] = None):
+    """Pick a codec from the client's Sec-WebSocket-Protocol offers or ``?encoding=``
+
+    Returns the codec and the subprotocol to echo back (None when the client
+    did not offer one, as browsers reject unexpected subprotocols).
+    """
+    codecs = available_codecs()
+    for codec in codecs:
+        if codec.subprotocol in subprotocols:
+            return codec, codec.subprotocol
+    for codec in codecs:
+        if codec.name == encoding:
+            return codec, None
+    return JSON_CODEC, None
@@ -0,0 +1,68 @@
+"""
+Benchmark session resume from a snapshot against a cold session start
+Run against a running backend: python scripts/benchmark_resume.py [--checkpoint] [--runs N]
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+import aiohttp
+
+class ResumeBenchmark:
+    def __init__(self, base_url="http://localhost:8000", checkpoint=False):
+        self.base_url = base_url
+        self.checkpoint = checkpoint
+
+    async def timed_post(self, session, path, payload=None):
+        """POST and return (response json, client-side seconds)"""
+        started = time.perf_counter()
+        async with session.post(f"{self.base_url}{path}", json=payload or {}) as response:
+            data = await response.json()
+            if response.status != 200:
+                raise Exception(f"{path} failed with {response.status}: {data}")
+        return data, time.perf_counter() - started
+
+    async def run_once(self, session):
+        cold, cold_seconds = await self.timed_post(session, "/sessions")
+
+        snapshot, _ = await self.timed_post(
+            session, f"/sessions/{cold['id']}/snapshot", {"checkpoint": self.checkpoint}
+        )
+
+        resumed, resume_seconds = await self.timed_post(session, f"/sessions/{cold['id']}/resume")
+        await session.delete(f"{self.base_url}/sessions/{resumed['id']}")
+
+        return cold_seconds, resume_seconds, snapshot["mode"]
+
+    async def run(self, runs=3):
+        cold_times, resume_times, modes = [], [], set()
+
+        async with aiohttp.ClientSession() as session:
+            for i in range(1, runs + 1):
+                cold_seconds, resume_seconds, mode = await self.run_once(session)
+                cold_times.append(cold_seconds)
+                resume_times.append(resume_seconds)
+                modes.add(mode)
+                print(f"Run {i}: cold {cold_seconds:.2f}s, resume ({mode}) {resume_seconds:.2f}s")
+
+        cold_median = statistics.median(cold_times)
+        resume_median = statistics.median(resume_times)
+        print("=" * 50)
+        print(f"Snapshot mode(s): {', '.join(sorted(modes))}")
+        print(f"Cold start median:  {cold_median:.2f}s")
+        print(f"Resume median:      {resume_median:.2f}s")
+        print(f"Speedup:            {cold_median / resume_median:.2f}x")
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--checkpoint", action="store_true", help="request CRIU checkpoints")
+    args = parser.parse_args()
+
+    await ResumeBenchmark(args.base_url, args.checkpoint).run(args.runs)
+
+if __name__ == "__main__":
+    asyncio.run(main())
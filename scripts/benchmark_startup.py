@@ -0,0 +1,78 @@
+"""
+Benchmark backend worker startup: import time of app.main plus lifespan startup
+Run from the repository root: python scripts/benchmark_startup.py [--runs N]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+# Runs in a fresh interpreter each time so nothing is cached between runs
+STARTUP_PROBE = """
+import asyncio, json, time
+started = time.perf_counter()
+import app.main
+imported = time.perf_counter()
+
+async def lifespan():
+    async with app.main.app.router.lifespan_context(app.main.app):
+        return time.perf_counter()
+
+ready = asyncio.run(lifespan())
+print(json.dumps({"import": imported - started, "startup": ready - imported}))
+"""
+
+def run_probe(env):
+    result = subprocess.run(
+        [sys.executable, "-c", STARTUP_PROBE],
+        cwd=REPO_ROOT, env=env, capture_output=True, text=True, check=True
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def slowest_imports(env, top=15):
+    """Modules with the largest cumulative import time, from python -X importtime"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        cwd=REPO_ROOT, env=env, capture_output=True, text=True, check=True
+    )
+    timings = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        # "import time:  self_us | cumulative_us | module"
+        self_us, cumulative_us, module = line.split("|")
+        timings.append((int(cumulative_us), int(self_us.split(":")[1]), module.strip()))
+    return sorted(timings, reverse=True)[:top]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--database-url", default=os.getenv("DATABASE_URL", "sqlite:///:memory:"))
+    args = parser.parse_args()
+
+    env = {**os.environ, "DATABASE_URL": args.database_url}
+
+    print("Slowest imports (cumulative ms / self ms):")
+    for cumulative_us, self_us, module in slowest_imports(env):
+        print(f"  {cumulative_us / 1000:8.1f} {self_us / 1000:8.1f}  {module}")
+
+    import_times, startup_times = [], []
+    for _ in range(args.runs):
+        timings = run_probe(env)
+        import_times.append(timings["import"])
+        startup_times.append(timings["startup"])
+
+    print("=" * 50)
+    print(f"Runs:                  {args.runs}")
+    print(f"Import app.main:       {statistics.median(import_times) * 1000:.1f} ms (median)")
+    print(f"Lifespan startup:      {statistics.median(startup_times) * 1000:.1f} ms (median)")
+    total = [i + s for i, s in zip(import_times, startup_times)]
+    print(f"Worker ready:          {statistics.median(total) * 1000:.1f} ms (median)")
+
+if __name__ == "__main__":
+    main()
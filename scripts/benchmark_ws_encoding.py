@@ -0,0 +1,84 @@
+"""
+Benchmark WebSocket frame encodings: JSON text vs MessagePack binary,
+each with and without per-message deflate compression
+Run from the repository root: python scripts/benchmark_ws_encoding.py
+"""
+
+import os
+import sys
+import time
+import zlib
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app.ws_protocol import JSONCodec, MsgPackCodec, msgpack
+
+def sample_frames():
+    """Representative agent traffic: many small text chunks plus tool results"""
+    timestamp = datetime.utcnow().isoformat()
+    frames = [
+        {"type": "agent_response", "content": f"token {i} of the streamed reply ", "timestamp": timestamp}
+        for i in range(500)
+    ]
+    # Screenshots compress poorly, so random bytes are a fair stand-in for PNG data
+    screenshot = os.urandom(200 * 1024)
+    frames += [
+        {"type": "tool_result", "tool": "computer", "image": screenshot, "timestamp": timestamp}
+        for _ in range(5)
+    ]
+    frames += [
+        {"type": "tool_result", "tool": "bash", "content": "line of shell output\n" * 200, "timestamp": timestamp}
+        for _ in range(20)
+    ]
+    return frames
+
+def deflate(data):
+    # Roughly what permessage-deflate does to each frame (raw deflate, no context takeover)
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    compressor = zlib.compressobj(wbits=-15)
+    return compressor.compress(data) + compressor.flush(zlib.Z_SYNC_FLUSH)
+
+def measure(codec, frames, compress, rounds=5):
+    best_encode = best_decode = float("inf")
+    total_bytes = 0
+    for _ in range(rounds):
+        started = time.perf_counter()
+        encoded = [codec.encode(frame) for frame in frames]
+        if compress:
+            wire = [deflate(data) for data in encoded]
+        else:
+            wire = encoded
+        best_encode = min(best_encode, time.perf_counter() - started)
+        total_bytes = sum(len(data) for data in wire)
+
+        started = time.perf_counter()
+        for data in encoded:
+            codec.decode(data)
+        best_decode = min(best_decode, time.perf_counter() - started)
+    return total_bytes, best_encode, best_decode
+
+def main():
+    frames = sample_frames()
+    codecs = [JSONCodec()]
+    if msgpack is not None:
+        codecs.append(MsgPackCodec())
+    else:
+        print("msgpack is not installed, only JSON is measured")
+
+    print(f"{len(frames)} frames")
+    print(f"{'encoding':<22}{'bytes':>12}{'encode ms':>12}{'decode ms':>12}")
+    baseline = None
+    for codec in codecs:
+        for compress in (False, True):
+            total_bytes, encode_seconds, decode_seconds = measure(codec, frames, compress)
+            baseline = baseline or total_bytes
+            label = codec.name + (" + deflate" if compress else "")
+            print(
+                f"{label:<22}{total_bytes:>12,}{encode_seconds * 1000:>12.2f}{decode_seconds * 1000:>12.2f}"
+                f"  ({total_bytes / baseline:.0%} of json)"
+            )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,233 @@
+// Minimal MessagePack codec for the cambioml.msgpack WebSocket wire format.
+// Covers nil, booleans, integers, floats, strings, binary, arrays and maps,
+// which is everything the server sends; extension types are rejected.
+// Served from our own origin so the page loads no third-party code.
+(function (global) {
+    'use strict';
+
+    const textEncoder = new TextEncoder();
+    const textDecoder = new TextDecoder();
+
+    class Writer {
+        constructor() {
+            this.buffer = new Uint8Array(256);
+            this.view = new DataView(this.buffer.buffer);
+            this.length = 0;
+        }
+
+        reserve(size) {
+            if (this.length + size <= this.buffer.length) return;
+            let capacity = this.buffer.length * 2;
+            while (capacity < this.length + size) capacity *= 2;
+            const buffer = new Uint8Array(capacity);
+            buffer.set(this.buffer.subarray(0, this.length));
+            this.buffer = buffer;
+            this.view = new DataView(buffer.buffer);
+        }
+
+        uint8(value) { this.reserve(1); this.view.setUint8(this.length, value); this.length += 1; }
+        uint16(value) { this.reserve(2); this.view.setUint16(this.length, value); this.length += 2; }
+        uint32(value) { this.reserve(4); this.view.setUint32(this.length, value); this.length += 4; }
+        int8(value) { this.reserve(1); this.view.setInt8(this.length, value); this.length += 1; }
+        int16(value) { this.reserve(2); this.view.setInt16(this.length, value); this.length += 2; }
+        int32(value) { this.reserve(4); this.view.setInt32(this.length, value); this.length += 4; }
+        float64(value) { this.reserve(8); this.view.setFloat64(this.length, value); this.length += 8; }
+
+        uint64(value) {
+            this.uint32(Math.floor(value / 0x100000000));
+            this.uint32(value >>> 0);
+        }
+
+        int64(value) {
+            this.reserve(8);
+            this.view.setBigInt64(this.length, BigInt(value));
+            this.length += 8;
+        }
+
+        bytes(value) {
+            this.reserve(value.length);
+            this.buffer.set(value, this.length);
+            this.length += value.length;
+        }
+
+        result() {
+            return this.buffer.slice(0, this.length);
+        }
+    }
+
+    function encodeInteger(writer, value) {
+        if (value >= 0) {
+            if (value < 0x80) return writer.uint8(value);
+            if (value < 0x100) { writer.uint8(0xcc); return writer.uint8(value); }
+            if (value < 0x10000) { writer.uint8(0xcd); return writer.uint16(value); }
+            if (value < 0x100000000) { writer.uint8(0xce); return writer.uint32(value); }
+            writer.uint8(0xcf);
+            return writer.uint64(value);
+        }
+        if (value >= -0x20) return writer.int8(value);
+        if (value >= -0x80) { writer.uint8(0xd0); return writer.int8(value); }
+        if (value >= -0x8000) { writer.uint8(0xd1); return writer.int16(value); }
+        if (value >= -0x80000000) { writer.uint8(0xd2); return writer.int32(value); }
+        writer.uint8(0xd3);
+        return writer.int64(value);
+    }
+
+    function encodeLength(writer, length, fixPrefix, fixLimit, prefixes) {
+        if (fixPrefix !== null && length < fixLimit) return writer.uint8(fixPrefix | length);
+        if (prefixes[0] !== null && length < 0x100) { writer.uint8(prefixes[0]); return writer.uint8(length); }
+        if (length < 0x10000) { writer.uint8(prefixes[1]); return writer.uint16(length); }
+        writer.uint8(prefixes[2]);
+        return writer.uint32(length);
+    }
+
+    function encodeValue(writer, value) {
+        if (value === null || value === undefined) return writer.uint8(0xc0);
+        if (value === false) return writer.uint8(0xc2);
+        if (value === true) return writer.uint8(0xc3);
+
+        if (typeof value === 'number') {
+            if (Number.isSafeInteger(value)) return encodeInteger(writer, value);
+            writer.uint8(0xcb);
+            return writer.float64(value);
+        }
+
+        if (typeof value === 'string') {
+            const data = textEncoder.encode(value);
+            encodeLength(writer, data.length, 0xa0, 32, [0xd9, 0xda, 0xdb]);
+            return writer.bytes(data);
+        }
+
+        if (value instanceof ArrayBuffer || ArrayBuffer.isView(value)) {
+            const data = value instanceof ArrayBuffer
+                ? new Uint8Array(value)
+                : new Uint8Array(value.buffer, value.byteOffset, value.byteLength);
+            encodeLength(writer, data.length, null, 0, [0xc4, 0xc5, 0xc6]);
+            return writer.bytes(data);
+        }
+
+        if (Array.isArray(value)) {
+            encodeLength(writer, value.length, 0x90, 16, [null, 0xdc, 0xdd]);
+            value.forEach((item) => encodeValue(writer, item));
+            return;
+        }
+
+        if (typeof value === 'object') {
+            const keys = Object.keys(value).filter((key) => value[key] !== undefined);
+            encodeLength(writer, keys.length, 0x80, 16, [null, 0xde, 0xdf]);
+            keys.forEach((key) => {
+                encodeValue(writer, key);
+                encodeValue(writer, value[key]);
+            });
+            return;
+        }
+
+        throw new TypeError(`Cannot encode ${typeof value} as MessagePack`);
+    }
+
+    class Reader {
+        constructor(data) {
+            this.data = data;
+            this.view = new DataView(data.buffer, data.byteOffset, data.byteLength);
+            this.offset = 0;
+        }
+
+        advance(size) {
+            if (this.offset + size > this.data.length) {
+                throw new RangeError('Truncated MessagePack data');
+            }
+            const offset = this.offset;
+            this.offset += size;
+            return offset;
+        }
+
+        uint8() { return this.view.getUint8(this.advance(1)); }
+        uint16() { return this.view.getUint16(this.advance(2)); }
+        uint32() { return this.view.getUint32(this.advance(4)); }
+        int8() { return this.view.getInt8(this.advance(1)); }
+        int16() { return this.view.getInt16(this.advance(2)); }
+        int32() { return this.view.getInt32(this.advance(4)); }
+        float32() { return this.view.getFloat32(this.advance(4)); }
+        float64() { return this.view.getFloat64(this.advance(8)); }
+        uint64() { return Number(this.view.getBigUint64(this.advance(8))); }
+        int64() { return Number(this.view.getBigInt64(this.advance(8))); }
+
+        bytes(length) {
+            const offset = this.advance(length);
+            return this.data.slice(offset, offset + length);
+        }
+
+        string(length) {
+            const offset = this.advance(length);
+            return textDecoder.decode(this.data.subarray(offset, offset + length));
+        }
+
+        array(length) {
+            const items = [];
+            for (let i = 0; i < length; i++) items.push(this.value());
+            return items;
+        }
+
+        map(length) {
+            const result = {};
+            for (let i = 0; i < length; i++) {
+                const key = this.value();
+                result[key] = this.value();
+            }
+            return result;
+        }
+
+        value() {
+            const type = this.uint8();
+            if (type < 0x80) return type;
+            if (type < 0x90) return this.map(type & 0x0f);
+            if (type < 0xa0) return this.array(type & 0x0f);
+            if (type < 0xc0) return this.string(type & 0x1f);
+            if (type >= 0xe0) return type - 0x100;
+
+            switch (type) {
+                case 0xc0: return null;
+                case 0xc2: return false;
+                case 0xc3: return true;
+                case 0xc4: return this.bytes(this.uint8());
+                case 0xc5: return this.bytes(this.uint16());
+                case 0xc6: return this.bytes(this.uint32());
+                case 0xca: return this.float32();
+                case 0xcb: return this.float64();
+                case 0xcc: return this.uint8();
+                case 0xcd: return this.uint16();
+                case 0xce: return this.uint32();
+                case 0xcf: return this.uint64();
+                case 0xd0: return this.int8();
+                case 0xd1: return this.int16();
+                case 0xd2: return this.int32();
+                case 0xd3: return this.int64();
+                case 0xd9: return this.string(this.uint8());
+                case 0xda: return this.string(this.uint16());
+                case 0xdb: return this.string(this.uint32());
+                case 0xdc: return this.array(this.uint16());
+                case 0xdd: return this.array(this.uint32());
+                case 0xde: return this.map(this.uint16());
+                case 0xdf: return this.map(this.uint32());
+                default:
+                    throw new TypeError(`Unsupported MessagePack type 0x${type.toString(16)}`);
+            }
+        }
+    }
+
+    function encode(value) {
+        const writer = new Writer();
+        encodeValue(writer, value);
+        return writer.result();
+    }
+
+    function decode(data) {
+        const reader = new Reader(data instanceof Uint8Array ? data : new Uint8Array(data));
+        const value = reader.value();
+        if (reader.offset !== reader.data.length) {
+            throw new RangeError('Trailing bytes after MessagePack value');
+        }
+        return value;
+    }
+
+    global.MessagePack = { encode, decode };
+})(typeof window !== 'undefined' ? window : globalThis);
@@ -0,0 +1,41 @@
+import os
+import tempfile
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+# The app reads its configuration at import time, so point it at throwaway
+# storage before any test module imports it
+_tmp_dir = tempfile.mkdtemp(prefix="cambioml-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{_tmp_dir}/app.db"
+os.environ["CHAT_ARCHIVE_DIR"] = os.path.join(_tmp_dir, "chat_archive")
+os.environ["DOCKER_HOSTS"] = "fake://host-a"
+os.environ["CONTAINER_READY_WAIT_SECONDS"] = "0"
+
+from fastapi.testclient import TestClient
+
+from app.migrations import run_migrations
+
+
+@pytest.fixture
+def db(tmp_path):
+    """A session on a fresh, fully migrated SQLite database"""
+    engine = create_engine(f"sqlite:///{tmp_path}/test.db")
+    run_migrations(engine)
+    session = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+    try:
+        yield session
+    finally:
+        session.close()
+        engine.dispose()
+
+
+@pytest.fixture(scope="session")
+def client():
+    """The API on the app's own SQLite database, with containers on a FakeBackend"""
+    from app.main import app
+
+    run_migrations()
+    with TestClient(app) as test_client:
+        yield test_client
@@ -0,0 +1,146 @@
+import pytest
+
+from app import main
+from app.database import SessionLocal, SessionDB, SessionSnapshotDB
+
+
+@pytest.fixture
+def backend():
+    return main.container_service.backends[0]
+
+
+def create_session(client):
+    response = client.post("/sessions", json={})
+    assert response.status_code == 200
+    return response.json()["id"]
+
+
+def get_session(session_id):
+    db = SessionLocal()
+    try:
+        return db.query(SessionDB).filter(SessionDB.id == session_id).first()
+    finally:
+        db.close()
+
+
+def get_snapshots(session_id):
+    db = SessionLocal()
+    try:
+        return db.query(SessionSnapshotDB).filter(SessionSnapshotDB.session_id == session_id).all()
+    finally:
+        db.close()
+
+
+def snapshot(client, session_id, checkpoint):
+    response = client.post(f"/sessions/{session_id}/snapshot", json={"checkpoint": checkpoint})
+    assert response.status_code == 200
+    return response.json()
+
+
+def resume(client, session_id):
+    response = client.post(f"/sessions/{session_id}/resume")
+    assert response.status_code == 200
+    return response.json()["id"]
+
+
+def test_filesystem_snapshot_commits_image_and_removes_container(client, backend):
+    session_id = create_session(client)
+    container_id = get_session(session_id).container_id
+
+    result = snapshot(client, session_id, checkpoint=False)
+
+    assert result["mode"] == "filesystem"
+    assert result["image"] == f"cambioml-snapshots:{session_id}"
+    assert result["image"] in backend.images
+    assert container_id not in backend.containers
+    assert get_session(session_id).status == "snapshotted"
+
+
+def test_checkpoint_snapshot_keeps_exited_container(client, backend):
+    session_id = create_session(client)
+    container_id = get_session(session_id).container_id
+
+    result = snapshot(client, session_id, checkpoint=True)
+
+    assert result["mode"] == "checkpoint"
+    assert backend.containers[container_id].status == "exited"
+    assert backend.containers[container_id].checkpoints == [f"session-{session_id}"]
+    assert get_snapshots(session_id)[0].checkpoint_id == f"session-{session_id}"
+
+
+def test_snapshot_of_inactive_session_is_rejected(client):
+    session_id = create_session(client)
+    client.delete(f"/sessions/{session_id}")
+
+    response = client.post(f"/sessions/{session_id}/snapshot", json={"checkpoint": False})
+
+    assert response.status_code == 409
+
+
+def test_checkpoint_is_consumed_by_the_first_resume(client, backend):
+    parent_id = create_session(client)
+    container_id = get_session(parent_id).container_id
+    snapshot(client, parent_id, checkpoint=True)
+
+    first_id = resume(client, parent_id)
+    second_id = resume(client, parent_id)
+
+    first, second = get_session(first_id), get_session(second_id)
+    assert first.container_id == container_id
+    assert backend.containers[container_id].status == "running"
+    assert second.container_id != container_id
+    assert backend.containers[second.container_id].image == f"cambioml-snapshots:{parent_id}"
+    assert (first.parent_session_id, second.parent_session_id) == (parent_id, parent_id)
+    snapshots = get_snapshots(parent_id)
+    assert [(s.checkpoint_id, s.mode) for s in snapshots] == [(None, "filesystem")]
+
+
+def test_ending_parent_after_checkpoint_resume_keeps_child_container(client, backend):
+    parent_id = create_session(client)
+    container_id = get_session(parent_id).container_id
+    snapshot(client, parent_id, checkpoint=True)
+    child_id = resume(client, parent_id)
+
+    client.delete(f"/sessions/{parent_id}")
+
+    assert backend.containers[container_id].status == "running"
+    assert get_session(child_id).status == "active"
+    assert f"cambioml-snapshots:{parent_id}" in backend.images
+    assert len(get_snapshots(parent_id)) == 1
+
+
+def test_ending_unused_checkpoint_removes_its_container_and_image(client, backend):
+    session_id = create_session(client)
+    container_id = get_session(session_id).container_id
+    snapshot(client, session_id, checkpoint=True)
+
+    client.delete(f"/sessions/{session_id}")
+
+    assert container_id not in backend.containers
+    assert f"cambioml-snapshots:{session_id}" not in backend.images
+    assert get_snapshots(session_id) == []
+    assert client.post(f"/sessions/{session_id}/resume").status_code == 404
+
+
+def test_snapshot_images_are_removed_when_the_whole_lineage_ends(client, backend):
+    root_id = create_session(client)
+    snapshot(client, root_id, checkpoint=False)
+    child_id = resume(client, root_id)
+    snapshot(client, child_id, checkpoint=False)
+    grandchild_id = resume(client, child_id)
+    images = {f"cambioml-snapshots:{root_id}", f"cambioml-snapshots:{child_id}"}
+
+    client.delete(f"/sessions/{root_id}")
+    client.delete(f"/sessions/{child_id}")
+
+    # The grandchild still runs from the child's image
+    assert images <= backend.images
+    # An ended session stays resumable while its lineage is alive
+    sibling_id = resume(client, root_id)
+
+    client.delete(f"/sessions/{grandchild_id}")
+    assert images <= backend.images
+
+    client.delete(f"/sessions/{sibling_id}")
+    assert not images & backend.images
+    assert get_snapshots(root_id) == get_snapshots(child_id) == []
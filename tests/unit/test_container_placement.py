@@ -0,0 +1,169 @@
+import asyncio
+import time
+
+import pytest
+
+from app.services import container_service as container_service_module
+from app.services.container_backends import (
+    DockerBackend,
+    FakeBackend,
+    LeastLoadedScheduler,
+    RoundRobinScheduler,
+    backend_from_url,
+    backends_from_env,
+    scheduler_from_env,
+)
+from app.services.container_service import ContainerService
+
+
+@pytest.fixture(autouse=True)
+def no_ready_wait(monkeypatch):
+    monkeypatch.setattr(container_service_module, "CONTAINER_READY_WAIT_SECONDS", 0)
+
+
+class SlowBackend(FakeBackend):
+    """FakeBackend whose Docker calls take a while, like a busy or distant daemon"""
+
+    def __init__(self, name, capacity=0, load_seconds=0.0, run_seconds=0.0):
+        super().__init__(name, capacity)
+        self.load_seconds = load_seconds
+        self.run_seconds = run_seconds
+
+    def load(self):
+        # Counted when the request arrives, answered later
+        load = super().load()
+        time.sleep(self.load_seconds)
+        return load
+
+    def run(self, image, **kwargs):
+        time.sleep(self.run_seconds)
+        return super().run(image, **kwargs)
+
+
+class UnreachableBackend(FakeBackend):
+    def load(self):
+        raise ConnectionError("host down")
+
+
+def test_backend_from_url():
+    assert isinstance(backend_from_url("fake://a"), FakeBackend)
+    assert backend_from_url("local").name == "local"
+    remote = backend_from_url(" tcp://10.0.0.2:2375 ", capacity=3)
+    assert isinstance(remote, DockerBackend)
+    assert (remote.name, remote.capacity) == ("tcp://10.0.0.2:2375", 3)
+
+
+def test_backends_and_scheduler_from_env(monkeypatch):
+    monkeypatch.setenv("DOCKER_HOSTS", "fake://a, fake://b,")
+    monkeypatch.setenv("DOCKER_HOST_CAPACITY", "4")
+    monkeypatch.setenv("CONTAINER_SCHEDULER", "round_robin")
+
+    backends = backends_from_env()
+
+    assert [(b.name, b.capacity) for b in backends] == [("fake://a", 4), ("fake://b", 4)]
+    assert isinstance(scheduler_from_env(), RoundRobinScheduler)
+    monkeypatch.setenv("CONTAINER_SCHEDULER", "random")
+    with pytest.raises(ValueError):
+        scheduler_from_env()
+
+
+def test_least_loaded_picks_the_least_busy_host():
+    a, b, c = FakeBackend("a"), FakeBackend("b"), FakeBackend("c")
+
+    assert LeastLoadedScheduler().select([a, b, c], {"a": 3, "b": 1, "c": 2}) is b
+
+
+def test_least_loaded_skips_full_and_unreachable_hosts():
+    full, down, free = FakeBackend("full", capacity=2), FakeBackend("down"), FakeBackend("free", capacity=5)
+
+    assert LeastLoadedScheduler().select([full, down, free], {"full": 2, "down": -1, "free": 4}) is free
+
+
+def test_least_loaded_raises_when_no_host_has_capacity():
+    a = FakeBackend("a", capacity=1)
+
+    with pytest.raises(Exception, match="No container host has free capacity"):
+        LeastLoadedScheduler().select([a, FakeBackend("down")], {"a": 1, "down": -1})
+
+
+def test_round_robin_cycles_through_hosts():
+    backends = [FakeBackend("a"), FakeBackend("b")]
+    scheduler = RoundRobinScheduler()
+
+    assert [scheduler.select(backends, {}).name for _ in range(5)] == ["a", "b", "a", "b", "a"]
+
+
+def test_create_container_places_on_least_loaded_host():
+    busy, idle = FakeBackend("busy"), FakeBackend("idle")
+    busy.run("image")
+    service = ContainerService([busy, idle], LeastLoadedScheduler())
+
+    info = asyncio.run(service.create_container())
+
+    assert info["host"] == "idle"
+    assert info["container_id"] in idle.containers
+
+
+def test_concurrent_creates_respect_capacity():
+    backends = [SlowBackend(name, capacity=1, run_seconds=0.2) for name in ("a", "b")]
+    service = ContainerService(backends + [UnreachableBackend("down")], LeastLoadedScheduler())
+
+    async def create_three():
+        return await asyncio.gather(*(service.create_container() for _ in range(3)), return_exceptions=True)
+
+    results = asyncio.run(create_three())
+
+    placed = [r for r in results if isinstance(r, dict)]
+    failed = [r for r in results if isinstance(r, Exception)]
+    assert sorted(r["host"] for r in placed) == ["a", "b"]
+    assert len(failed) == 1 and "No container host has free capacity" in str(failed[0])
+    assert [b.load() for b in backends] == [1, 1]
+    assert service.pending == {"a": 0, "b": 0}
+
+
+def test_container_started_after_a_poll_still_counts():
+    # The second create polls before the first container runs, so its poll
+    # reports an empty host; the container started since must still count
+    host = SlowBackend("a", capacity=1, load_seconds=0.2)
+    service = ContainerService([host], LeastLoadedScheduler())
+
+    async def overlapping_creates():
+        first = asyncio.create_task(service.create_container())
+        await asyncio.sleep(0.1)
+        second = asyncio.create_task(service.create_container())
+        return await asyncio.gather(first, second, return_exceptions=True)
+
+    first, second = asyncio.run(overlapping_creates())
+
+    assert first["host"] == "a"
+    assert isinstance(second, Exception)
+    assert len(host.containers) == 1
+
+
+def test_slow_host_does_not_serialize_placements():
+    slow = SlowBackend("slow", load_seconds=0.3)
+    fast = FakeBackend("fast")
+    service = ContainerService([slow, fast], LeastLoadedScheduler())
+
+    async def create_concurrently():
+        started = time.perf_counter()
+        results = await asyncio.gather(*(service.create_container() for _ in range(4)))
+        return results, time.perf_counter() - started
+
+    results, elapsed = asyncio.run(create_concurrently())
+
+    assert len(results) == 4
+    # One poll of the slow host at a time would take 4 x 0.3s
+    assert elapsed < 0.9
+
+
+def test_explicit_host_skips_the_scheduler():
+    a, b = FakeBackend("a", capacity=1), FakeBackend("b")
+    a.run("image")
+    service = ContainerService([a, b], LeastLoadedScheduler())
+
+    # Snapshot images only exist on their own host, so restores go there regardless of load
+    info = asyncio.run(service.create_container(image="snapshot", host="a"))
+
+    assert info["host"] == "a"
+    assert a.containers[info["container_id"]].image == "snapshot"
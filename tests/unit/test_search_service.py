@@ -0,0 +1,129 @@
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.database import ChatMessageDB, SessionDB
+from app.services.archive_service import ArchiveService
+from app.services.search_service import SearchService
+
+T0 = datetime(2024, 1, 15, 10, 0, 0)
+
+
+@pytest.fixture
+def search(db):
+    return SearchService(db.get_bind())
+
+
+def add_message(db, session_id, content, role="user", timestamp=T0):
+    message = ChatMessageDB(
+        id=str(uuid.uuid4()),
+        session_id=session_id,
+        role=role,
+        content=content,
+        timestamp=timestamp
+    )
+    db.add(message)
+    db.commit()
+    return message
+
+
+def add_session(db, session_id, status="active"):
+    db.add(SessionDB(id=session_id, container_id="container", vnc_port=5900, status=status))
+    db.commit()
+
+
+@pytest.mark.parametrize("query, expected", [
+    ("firefox", '"firefox"'),
+    ("open firefox", '"open" "firefox"'),
+    ('say "hi"', '"say" """hi"""'),
+    ("AND OR NOT", '"AND" "OR" "NOT"'),
+    ("col:value*", '"col:value*"'),
+    ("   ", '""'),
+])
+def test_fts5_query_quotes_every_term(query, expected):
+    assert SearchService()._fts5_query(query) == expected
+
+
+@pytest.mark.parametrize("query", ['"unbalanced', "a AND", "NEAR(", "content:", "*", "-firefox"])
+def test_fts5_syntax_in_user_input_does_not_raise(db, search, query):
+    add_message(db, "s1", "open firefox please")
+    assert search.search(db, query)["total"] >= 0
+
+
+def test_search_ranks_matches_and_highlights_snippet(db, search):
+    add_message(db, "s1", "open firefox and then open firefox again")
+    add_message(db, "s1", "firefox once, among many other unrelated words here")
+    add_message(db, "s1", "nothing relevant")
+
+    response = search.search(db, "firefox")
+
+    assert response["total"] == 2
+    assert [r["snippet"].count("<b>firefox</b>") for r in response["results"]] == [2, 1]
+    assert response["results"][0]["rank"] >= response["results"][1]["rank"]
+
+
+def test_snippet_escapes_message_content(db, search):
+    add_message(db, "s1", '<img src=x onerror="alert(1)"> firefox & <b>more</b>')
+
+    snippet = search.search(db, "firefox")["results"][0]["snippet"]
+
+    assert "<img" not in snippet
+    assert "&lt;img src=x onerror=&quot;alert(1)&quot;&gt;" in snippet
+    assert "&lt;b&gt;more&lt;/b&gt;" in snippet
+    assert "<b>firefox</b>" in snippet
+
+
+def test_filters_by_session_and_role(db, search):
+    add_message(db, "s1", "firefox", role="user")
+    add_message(db, "s1", "firefox", role="assistant")
+    add_message(db, "s2", "firefox", role="user")
+
+    assert search.search(db, "firefox", session_id="s1")["total"] == 2
+    assert search.search(db, "firefox", role="assistant")["total"] == 1
+    results = search.search(db, "firefox", session_id="s2", role="user")["results"]
+    assert [(r["session_id"], r["role"]) for r in results] == [("s2", "user")]
+
+
+def test_since_is_inclusive_and_until_exclusive(db, search):
+    # Microseconds matter: timestamps are compared as SQLite strings
+    for minutes in range(4):
+        add_message(db, "s1", f"firefox {minutes}", timestamp=T0 + timedelta(minutes=minutes, microseconds=500))
+
+    since = T0 + timedelta(minutes=1, microseconds=500)
+    until = T0 + timedelta(minutes=3, microseconds=500)
+    results = search.search(db, "firefox", since=since, until=until)["results"]
+
+    assert sorted(r["timestamp"] for r in results) == [
+        "2024-01-15 10:01:00.000500",
+        "2024-01-15 10:02:00.000500",
+    ]
+    assert search.search(db, "firefox", since=T0 + timedelta(minutes=3, microseconds=501))["total"] == 0
+    assert search.search(db, "firefox", until=T0)["total"] == 0
+
+
+def test_total_and_pagination(db, search):
+    for minutes in range(7):
+        add_message(db, "s1", "firefox", timestamp=T0 + timedelta(minutes=minutes))
+
+    pages = [search.search(db, "firefox", limit=3, offset=offset) for offset in (0, 3, 6)]
+
+    assert [page["total"] for page in pages] == [7, 7, 7]
+    assert [len(page["results"]) for page in pages] == [3, 3, 1]
+    assert (pages[1]["limit"], pages[1]["offset"]) == (3, 3)
+    ids = [r["message_id"] for page in pages for r in page["results"]]
+    assert len(set(ids)) == 7
+    assert search.search(db, "firefox", limit=3, offset=9)["results"] == []
+
+
+def test_archived_messages_still_match(db, search, tmp_path):
+    add_session(db, "s1", status="inactive")
+    message_id = add_message(db, "s1", "open firefox").id
+
+    archived = ArchiveService(archive_dir=str(tmp_path / "archive")).archive_session(db, "s1")
+
+    assert archived == 1
+    assert db.query(ChatMessageDB).count() == 0
+    results = search.search(db, "firefox")["results"]
+    assert [r["message_id"] for r in results] == [message_id]
+    assert results[0]["snippet"] == "open <b>firefox</b>"